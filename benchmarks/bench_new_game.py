@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of new game latency for large custom decks.
+
+Compares creating the Draw Deck from a deepcopy of the starter deck
+(the previous behaviour of Game.initialise_draw_deck) with the
+copy-on-write Deck.copy() it uses now.
+
+Run from the repository root:
+    python benchmarks/bench_new_game.py
+"""
+
+import os
+import sys
+import timeit
+from copy import deepcopy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from decks import Card, Deck, DrawDeck  # noqa: E402
+
+COLORS = ['blue', 'yellow', 'black', 'red']
+SIZES = [48, 500, 2000, 10000]
+
+
+def starter_deck(size):
+    """Build a starter deck of size cards, with 3 copies of each city."""
+    deck = Deck('Starter Deck')
+    for i in range(size):
+        deck.add(Card(f'City {i // 3}', COLORS[i // 3 % len(COLORS)]))
+    return deck
+
+
+def new_game_deepcopy(starter):
+    deck = DrawDeck('draw')
+    deck.add(deepcopy(starter))
+    return deck
+
+
+def new_game_copy(starter):
+    deck = DrawDeck('draw')
+    deck.add(starter.copy())
+    return deck
+
+
+def measure(function, starter, number=200):
+    """Return the best time per call in microseconds."""
+    times = timeit.repeat(lambda: function(starter), number=number, repeat=5)
+    return min(times) / number * 1e6
+
+
+def main():
+    print(f'{"cards":>8} {"deepcopy (us)":>15} {"copy (us)":>12} '
+          f'{"speedup":>8}')
+    for size in SIZES:
+        starter = starter_deck(size)
+        before = measure(new_game_deepcopy, starter)
+        after = measure(new_game_copy, starter)
+        print(f'{size:>8} {before:>15.1f} {after:>12.1f} '
+              f'{before / after:>7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+
+"""
+Benchmark suite for the hot paths of decks, game, stats and the App.
+
+Games are played on synthetic starter decks of 48 up to 10,000 cards,
+with 0 to 10 epidemics already shuffled in, and on scripted full games
+played from the start. The Qt benchmarks run headless on the offscreen
+platform and are skipped if PySide2 isn't installed.
+
+Results are written as JSON so that runs can be compared:
+    python benchmarks/bench_suite.py --output before.json
+    python benchmarks/bench_suite.py --quick --no-qt
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from decks import Card, Deck  # noqa: E402
+from game import Game  # noqa: E402
+
+COLORS = ['blue', 'yellow', 'black', 'red']
+SIZES = [48, 500, 2000, 10000]
+EPIDEMICS = [0, 5, 10]
+TITLE = 'Synthetic'
+GAME_ACTIONS = 500           # Actions in a scripted full game
+
+
+###############################################################################
+# Synthetic games
+###############################################################################
+
+
+def starter_deck(size):
+    """Build a starter deck of size cards, with 3 copies of each city."""
+    deck = Deck('Starter Deck')
+    for i in range(size):
+        deck.add(Card(f'City {i // 3}', COLORS[i // 3 % len(COLORS)]))
+    return deck
+
+
+def new_game(size, game=None):
+    """Start a Game on a synthetic starter deck."""
+    game = game if game is not None else Game()
+    game.games = {TITLE: starter_deck(size)}
+    game.initialise(TITLE)
+    return game
+
+
+def top_card(game, rng):
+    """Return a random card from the top of the Draw Deck."""
+    return rng.choice(list(game.deck['draw'].top().unique()))
+
+
+def infect(game, rng):
+    """Draw a random card from the top of the Draw Deck to the discard."""
+    card = top_card(game, rng)
+    game.draw_card(game.deck['draw'], game.deck['discard'], card)
+    return card
+
+
+def epidemic(game, rng):
+    """Shuffle an epidemic with a random card from the bottom pool."""
+    names = sorted(card.name for card in game.deck['draw'].bottom().unique())
+    game.epidemic(rng.choice(names))
+
+
+def play(game, epidemics, rng, rate=None):
+    """Play infections and epidemics until epidemics were shuffled.
+    Each epidemic follows rate infections, by default a tenth
+    of the Draw Deck shared between the epidemics."""
+    size = len(game.deck['draw'])
+    rate = rate or max(1, min(9, size // (10 * (epidemics + 1))))
+    for i in range(epidemics):
+        for j in range(rate):
+            if len(game.deck['draw']) > 1:
+                infect(game, rng)
+        epidemic(game, rng)
+    return game
+
+
+def synthetic_game(size, epidemics, seed=0):
+    """Return a Game with epidemics shuffled into a starter deck."""
+    return play(new_game(size), epidemics, random.Random(seed))
+
+
+###############################################################################
+# Timing
+###############################################################################
+
+
+def measure(action, setup=None, number=100, repeat=5):
+    """Time number calls of action, repeat times, calling setup
+    before each repeat. Returns timings per call in microseconds."""
+    times = []
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for j in range(number):
+            action()
+        times.append((time.perf_counter() - start) / number * 1e6)
+    return {'best_us': min(times),
+            'median_us': statistics.median(times),
+            'number': number,
+            'repeat': repeat}
+
+
+def result(name, size, epidemics, timing, **extra):
+    return dict(name=name, cards=size, epidemics=epidemics, **timing,
+                **extra)
+
+
+###############################################################################
+# Benchmarks
+###############################################################################
+
+
+def bench_deck_move(size, epidemics):
+    """Move a card to the excluded cards and back."""
+    game = synthetic_game(size, epidemics)
+    discard, exclude = game.deck['discard'], game.deck['exclude']
+    card = next(iter(game.deck['draw'].top().unique()))
+    discard.add(card)
+
+    def action():
+        discard.move(card, exclude)
+        exclude.move(card, discard)
+
+    timing = measure(action, number=500)
+    timing['best_us'] /= 2
+    timing['median_us'] /= 2
+    yield result('Deck.move', size, epidemics, timing)
+
+
+def bench_draw_deck_add(size, epidemics):
+    """Add a card to the Draw Deck at each position and remove it."""
+    game = synthetic_game(size, epidemics)
+    draw = game.deck['draw']
+    card = next(iter(draw.top().unique()))
+
+    def top():
+        draw.add(card, position='top')
+        draw.remove(card)
+
+    def single():
+        draw.add(card, position='single')
+        draw.remove(card)
+
+    def bottom():
+        draw.add(card, position='bottom')
+        draw.remove_from_bottom(card)
+
+    for position, action in [('top', top), ('single', single),
+                             ('bottom', bottom)]:
+        yield result('DrawDeck.add', size, epidemics,
+                     measure(action, number=500), position=position)
+
+
+def bench_game_epidemic(size, epidemics):
+    """Shuffle one more epidemic, restoring the state every time."""
+    game = synthetic_game(size, epidemics)
+    state = game.snapshot()
+    rng = random.Random(0)
+
+    def setup():
+        game.load(state)
+        for i in range(3):
+            infect(game, rng)
+
+    yield result('Game.epidemic', size, epidemics,
+                 measure(lambda: epidemic(game, rng), setup, number=1,
+                         repeat=20))
+
+
+def bench_stats_top_cards(size, epidemics):
+    """Read the top cards, then after an infection and its undo."""
+    game = synthetic_game(size, epidemics)
+    stats = game.stats
+    rng = random.Random(0)
+    yield result('Stats.top_cards', size, epidemics,
+                 measure(lambda: stats.top_cards, number=1000))
+
+    def action():
+        infect(game, rng)
+        stats.top_cards
+        game.undo()
+
+    yield result('Stats.top_cards after draw', size, epidemics,
+                 measure(action, number=100))
+
+
+def bench_game_preview(size, epidemics):
+    """Preview a draw onto the top and an epidemic, as on mouse-over."""
+    game = synthetic_game(size, epidemics)
+    card = next(iter(game.deck['draw'].top().unique()))
+    game.draw_card(game.deck['draw'], game.deck['discard'], card)
+    name = next(iter(game.deck['draw'].bottom().unique())).name
+    yield result('Game.preview_draw', size, epidemics,
+                 measure(lambda: game.preview_draw(card, 'discard', 'draw',
+                                                   'top'), number=200))
+    yield result('Game.preview_epidemic', size, epidemics,
+                 measure(lambda: game.preview_epidemic(name), number=200))
+
+
+def bench_full_game(size, epidemics, actions=GAME_ACTIONS):
+    """Play a scripted game from the start: epidemics every two
+    infections, then infections until the actions are played."""
+    rng = random.Random(0)
+    game = Game()
+    played = []
+
+    def action():
+        new_game(size, game)
+        play(game, epidemics, rng, rate=2)
+        count = epidemics * 3
+        while count < actions and len(game.deck['draw']) > 1:
+            infect(game, rng)
+            count += 1
+        played.append(count)
+
+    timing = measure(action, number=1, repeat=3)
+    yield result('Full game', size, epidemics, timing, actions=played[-1])
+
+
+BENCHMARKS = [bench_deck_move, bench_draw_deck_add, bench_game_epidemic,
+              bench_stats_top_cards, bench_game_preview, bench_full_game]
+
+
+###############################################################################
+# Qt benchmarks
+###############################################################################
+
+
+def qt_benchmarks():
+    """Return the Qt benchmarks, or [] if PySide2 can't be imported."""
+    try:
+        from PySide2.QtWidgets import QApplication
+    except ImportError:
+        return []
+    from epidemic import App
+    from qt import MainWindow
+
+    # The App is never shown and the event loop never runs,
+    # so the new game dialog it schedules doesn't open
+    QApplication.instance() or QApplication([])
+
+    def make_app(size, epidemics):
+        view = MainWindow()
+        app = App(synthetic_game(size, epidemics), view)
+        view.initialise()
+        app.populate_draw()
+        app.flush()
+        return app
+
+    def bench_populate_draw(size, epidemics):
+        """Refresh the draw column after a draw, then from scratch."""
+        app = make_app(size, epidemics)
+        game = app.game
+        draw, discard = game.deck['draw'], game.deck['discard']
+        state = game.snapshot()
+        rng = random.Random(0)
+
+        def setup():
+            game.load(state)
+            app.populate_draw()
+
+        def after_draw():
+            game.draw_card(draw, discard, top_card(game, rng))
+            app.populate_draw()
+
+        yield result('App.populate_draw after draw', size, epidemics,
+                     measure(after_draw, setup, number=1, repeat=20))
+
+        def rebuild():
+            app.view.deck['draw'].clear()
+            app.populate_draw()
+
+        yield result('App.populate_draw rebuild', size, epidemics,
+                     measure(rebuild, number=10))
+
+    def bench_app_draw_card(size, epidemics):
+        """Draw a card through the App and redraw the panels."""
+        app = make_app(size, epidemics)
+        game = app.game
+        draw, discard = game.deck['draw'], game.deck['discard']
+        state = game.snapshot()
+        rng = random.Random(0)
+
+        def setup():
+            game.load(state)
+            app.populate_draw()
+
+        def action():
+            app.draw_card(top_card(game, rng), draw, discard, 'deck')
+            app.flush()
+            app.view.log.flush()
+
+        yield result('App.draw_card', size, epidemics,
+                     measure(action, setup, number=1, repeat=20))
+
+    return [bench_populate_draw, bench_app_draw_card]
+
+
+###############################################################################
+# Main
+###############################################################################
+
+
+def run(sizes, epidemics, qt=True, pattern=None):
+    benchmarks = BENCHMARKS + (qt_benchmarks() if qt else [])
+    results = []
+    for benchmark in benchmarks:
+        for size in sizes:
+            for count in epidemics:
+                if pattern and pattern not in benchmark.__name__:
+                    continue
+                for entry in benchmark(size, count):
+                    print(f'{entry["name"]:<32} {size:>6} cards '
+                          f'{count:>3} epidemics {entry["best_us"]:>12.1f} us',
+                          file=sys.stderr)
+                    results.append(entry)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--output', '-o', help='JSON file (default stdout)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--epidemics', type=int, nargs='+',
+                        default=EPIDEMICS)
+    parser.add_argument('--quick', action='store_true',
+                        help='Only the smallest and largest decks')
+    parser.add_argument('--no-qt', action='store_true',
+                        help='Skip the Qt benchmarks')
+    parser.add_argument('--filter',
+                        help='Only the bench_ functions matching this')
+    args = parser.parse_args()
+
+    sizes = [min(args.sizes), max(args.sizes)] if args.quick else args.sizes
+    epidemics = [max(args.epidemics)] if args.quick else args.epidemics
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': run(sizes, epidemics, not args.no_qt, args.filter),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
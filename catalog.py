@@ -0,0 +1,138 @@
+"""
+The card catalog: the starter deck of every game title in cards.yml.
+
+Parsing cards.yml with PyYAML is slow, so the parsed catalog is
+compiled to a pickle of plain tuples in the user cache directory.
+The cache is keyed on the modification time of cards.yml and,
+if that changed, on a SHA-256 hash of its contents. It is read back
+in a single read, and rebuilt with the C YAML loader when stale.
+
+Starter decks are only built when a game title is looked up.
+"""
+
+from collections.abc import Mapping
+import hashlib
+import os
+import pickle
+
+from decks import Card, Deck
+import utility
+
+import logging
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = 'cards-{}.cache'  # Formatted with a hash of the source path
+CACHE_VERSION = 1
+
+
+class Catalog(Mapping):
+    """Read-only mapping of game titles to starter Decks."""
+
+    def __init__(self, path, cache_dir=None):
+        self.path = path
+        key = hashlib.sha256(os.path.realpath(path).encode()).hexdigest()
+        try:
+            cache_dir = cache_dir or utility.get_cache_dir()
+        except OSError as e:
+            # Parse cards.yml on every start rather than not start at all
+            logger.warning(f'No card catalog cache directory ({e})')
+            self.cache_path = None
+        else:
+            self.cache_path = os.path.join(cache_dir,
+                                           CACHE_FILE.format(key[:16]))
+        self.games = self.load()   # Game title -> (name, color, count)s
+        self._decks = {}
+
+    def load(self):
+        """Return the compiled catalog, from the cache if it is valid."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError as e:
+            print(f'Missing or damaged cards.yml configuration file\n({e})')
+            return {}
+
+        cache = self.read_cache()
+        if cache and (cache['mtime'], cache['size']) == \
+                (stat.st_mtime_ns, stat.st_size):
+            return cache['games']
+
+        with open(self.path, 'rb') as f:
+            source = f.read()
+        digest = hashlib.sha256(source).hexdigest()
+        if cache and cache['hash'] == digest:
+            games = cache['games']
+        else:
+            logger.info(f'Compiling card catalog {self.path}')
+            games = self.compile(self.parse(source))
+        self.write_cache({'version': CACHE_VERSION,
+                          'mtime': stat.st_mtime_ns,
+                          'size': stat.st_size,
+                          'hash': digest,
+                          'games': games})
+        return games
+
+    def read_cache(self):
+        if self.cache_path is None:
+            return None
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cache = pickle.loads(f.read())
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.info(f'No card catalog cache ({e})')
+            return None
+        if not isinstance(cache, dict) or \
+                cache.get('version') != CACHE_VERSION:
+            return None
+        return cache
+
+    def write_cache(self, cache):
+        # Write to a temporary file first so readers never see a partial
+        # cache, and carry on without a cache if the directory is read-only
+        if self.cache_path is None:
+            return
+        temp = f'{self.cache_path}.{os.getpid()}.tmp'
+        try:
+            with open(temp, 'wb') as f:
+                f.write(pickle.dumps(cache, pickle.HIGHEST_PROTOCOL))
+            os.replace(temp, self.cache_path)
+        except OSError as e:
+            logger.warning(f'Card catalog cache not written ({e})')
+
+    @staticmethod
+    def parse(source):
+        # PyYAML is only imported when the cache needs rebuilding.
+        # The C loader is only available if it was built with libyaml.
+        import yaml
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        return yaml.load(source, Loader=loader)
+
+    @staticmethod
+    def compile(data):
+        """Validate the parsed cards.yml data and convert it to tuples."""
+        games = {}
+        for game_title, items in (data or {}).items():
+            cards = []
+            for item in items:
+                if item['color'] not in Card.valid_colors:
+                    raise ValueError(f"Invalid color '{item['color']}' in "
+                                     f"'{game_title} : {item['name']}'")
+                Card(item['name'], item['color'])  # Validate the name
+                cards.append((item['name'], item['color'], item['count']))
+            games[game_title] = tuple(cards)
+        return games
+
+    def __getitem__(self, game_title):
+        if game_title not in self._decks:
+            deck = Deck('Starter Deck')
+            for name, color, count in self.games[game_title]:
+                card = Card(name, color)
+                for i in range(count):
+                    deck.add(card)
+            self._decks[game_title] = deck
+        return self._decks[game_title]
+
+    def __iter__(self):
+        return iter(self.games)
+
+    def __len__(self):
+        return len(self.games)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+"""
+Command line interface for the Epidemic tracker.
+
+Runs the game engine without Qt, either as an interactive shell
+or on a script of commands, one per line:
+
+    python cli.py
+    python cli.py --game "Legacy Season 2 (Full)" --script turns.txt
+    python cli.py --game "Legacy Season 2 (Full)" -c "infect Lagos" \
+        -c stats
+
+With --journal DIR the game is journaled in a directory, and
+"log all" shows its whole history.
+"""
+
+import argparse
+import cmd
+import json
+
+from engine import Engine, DESTINATIONS
+from game import Game
+from journal import Journal
+from metrics import metrics, from_environment
+
+
+def instrument():
+    """Time the game actions and the engine commands."""
+    metrics.instrument(Game, 'draw_card', 'epidemic', 'undo', 'redo')
+    metrics.instrument(Engine, 'move', 'epidemic', 'stats', 'chance', 'pool')
+
+
+class Shell(cmd.Cmd):
+    intro = 'Epidemic tracker. Type help or ? to list commands.'
+    prompt = '(epidemic) '
+
+    def __init__(self, engine, stdin=None, stdout=None, journal=None):
+        super().__init__(stdin=stdin, stdout=stdout)
+        self.engine = engine
+        self.journal = journal
+
+    def print(self, text=''):
+        self.stdout.write(f'{text}\n')
+
+    def onecmd(self, line):
+        # Report errors from the engine and carry on
+        try:
+            return super().onecmd(line)
+        except (ValueError, IndexError) as e:
+            self.print(f'Error: {e}')
+            return False
+
+    def emptyline(self):
+        pass
+
+    def do_games(self, arg):
+        """games: list the game titles in cards.yml"""
+        for title in self.engine.titles:
+            self.print(title)
+
+    def do_new(self, arg):
+        """new TITLE: start a new game"""
+        self.engine.new_game(arg.strip())
+        self.print(self.engine.log()[-1])
+
+    def do_infect(self, arg):
+        """infect CITY: draw a card from the top of the Draw Deck"""
+        card = self.engine.infect(arg.strip())
+        self.print(f'{card.name} infected')
+
+    def do_move(self, arg):
+        """move FROM TO CITY: move a card between decks.
+        FROM is draw, discard or exclude.
+        TO is top, bottom, single, discard or exclude."""
+        words = arg.split(maxsplit=2)
+        if len(words) < 3:
+            raise ValueError('Usage: move FROM TO CITY')
+        source, destination, name = words
+        card = self.engine.move(name, source, destination)
+        self.print(f'{card.name} moved ({source} -> {destination})')
+
+    def complete_move(self, text, line, begidx, endidx):
+        words = line[:begidx].split()
+        options = ['draw', 'discard', 'exclude'] if len(words) == 1 \
+            else list(DESTINATIONS) if len(words) == 2 else []
+        return [option for option in options if option.startswith(text)]
+
+    def do_epidemic(self, arg):
+        """epidemic CITY: draw a card from the bottom of the Draw Deck
+        and shuffle the discard pile on top"""
+        self.engine.epidemic(arg.strip())
+        self.print(self.engine.log()[-1])
+
+    def do_undo(self, arg):
+        """undo: undo the last action"""
+        self.print('Undone' if self.engine.undo() else 'Nothing to undo')
+
+    def do_redo(self, arg):
+        """redo: redo the last undone action"""
+        self.print('Redone' if self.engine.redo() else 'Nothing to redo')
+
+    def do_stats(self, arg):
+        """stats: show the Stats panel"""
+        stats = self.engine.stats()
+        self.print(f'Total cards in game: {stats["total"]}')
+        self.print(f'In discard pile: {stats["in_discard"]}')
+        self.print(f'In draw deck: {stats["in_draw"]}')
+        if 'top_probability' in stats:
+            self.print(f'Top probability: {stats["top_probability"]:.2%} '
+                       f'({stats["top_freq"]} of each)')
+            for name in stats['top_cards']:
+                self.print(f'  {name}')
+
+    def do_chance(self, arg):
+        """chance DRAWS CITY[, CITY...] | COLOR: chance of drawing
+        any of the cities, or any card of the color, in the next draws"""
+        words = arg.split(maxsplit=1)
+        if len(words) < 2 or not words[0].isdigit():
+            raise ValueError('Usage: chance DRAWS CITY[, CITY...] | COLOR')
+        names = [name.strip() for name in words[1].split(',')]
+        target = names[0] if len(names) == 1 else names
+        chance = self.engine.chance(target, int(words[0]))
+        self.print(f'{chance:.2%}')
+
+    def do_pool(self, arg):
+        """pool [POSITION]: possible cards at a draw position (1 = top)"""
+        position = int(arg) if arg.strip() else 1
+        if position < 1:
+            raise ValueError('Positions start at 1')
+        for name, count, probability in self.engine.pool(position - 1):
+            self.print(f'{name} ({count}, {probability:.0%})')
+
+    def do_deck(self, arg):
+        """deck NAME: list the cards in draw (top pool), discard or exclude"""
+        for name, count in self.engine.cards(arg.strip() or 'draw'):
+            self.print(f'{name} ({count})')
+
+    def do_log(self, arg):
+        """log [all]: show the recent game log,
+        or the whole history of the game from the journal"""
+        arg = arg.strip()
+        if arg == 'all':
+            if self.journal is None:
+                raise ValueError('No journal, start with --journal DIR')
+            entries = self.journal.history()
+        elif not arg:
+            entries = self.engine.log()
+        else:
+            raise ValueError('Usage: log [all]')
+        for entry in entries:
+            self.print(entry)
+
+    def do_metrics(self, arg):
+        """metrics [on|off|reset|json]: latency of each operation
+        (call count and p50/p95/p99 in milliseconds)"""
+        arg = arg.strip()
+        if arg == 'on':
+            instrument()
+            metrics.enable()
+        elif arg == 'off':
+            metrics.disable()
+        elif arg == 'reset':
+            metrics.reset()
+        elif arg == 'json':
+            self.print(json.dumps(metrics.report(), indent=2))
+        elif not arg:
+            self.print(metrics.format())
+        else:
+            raise ValueError('Usage: metrics [on|off|reset|json]')
+        if arg in ('on', 'off'):
+            self.print(f'Metrics {arg}')
+
+    def do_quit(self, arg):
+        """quit: exit the shell"""
+        return True
+
+    def do_EOF(self, arg):
+        self.print()
+        return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Epidemic tracker shell.')
+    parser.add_argument('--game', help='start a new game with this title')
+    parser.add_argument('--script', type=argparse.FileType('r'),
+                        help='run the commands in a file (- for stdin)')
+    parser.add_argument('-c', '--command', action='append', default=[],
+                        help='run a command (can be repeated)')
+    parser.add_argument('--journal', metavar='DIR',
+                        help='journal the game in a directory')
+    args = parser.parse_args(argv)
+
+    instrument()
+    from_environment()
+    engine = Engine()
+    journal = None
+    if args.journal:
+        journal = Journal(args.journal)
+        journal.attach(engine.game)
+    shell = Shell(engine, journal=journal)
+    if args.game:
+        shell.onecmd(f'new {args.game}')
+
+    commands = args.command + (args.script.readlines() if args.script else [])
+    if commands:
+        for line in commands:
+            shell.onecmd(line.strip())
+    else:
+        shell.cmdloop()
+    if journal is not None:
+        journal.close()
+
+
+if __name__ == '__main__':
+    main()
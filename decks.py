@@ -6,37 +6,108 @@ for representing Card objects and Deck objects.
 
 The DrawDeck object extends Deck and holds other Decks, not Cards.
 Each of these Decks represents the possible draws at each position
-in the DrawDeck. The top card is the last Card in the list.
+in the DrawDeck. Positions sharing the same Deck are stored together
+as one segment, and the top segment is the last one in the deque.
 """
 
+from collections import deque
+import hashlib
+import threading
+
 import logging
 logger = logging.getLogger(__name__)
 
+MASK = (1 << 64) - 1
+
+
+def mix(x):
+    # SplitMix64 finalizer: scrambles the bits of a 64-bit integer
+    x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9 & MASK
+    x = (x ^ (x >> 27)) * 0x94d049bb133111eb & MASK
+    return x ^ (x >> 31)
+
+
+def segment_key(fingerprint, count, depth):
+    """Return the fingerprint of a Draw Deck segment: a pool
+    with this fingerprint covering count draws, at a depth counted
+    from 0 at the bottom."""
+    return mix((fingerprint + mix(depth + 1) + count * 0x9e3779b97f4a7c15)
+               & MASK)
+
 
 class Card:
     """Basic class to represent a card with a city name and color.
-    Cards are referenced in Decks."""
+    Cards are referenced in Decks.
+
+    Cards are immutable flyweights interned by (name, color):
+    creating the same card twice returns the same object.
+    Each unique Card gets a dense integer id, which Decks use
+    to index their count arrays, and a random 64-bit key derived
+    from its name and color, which Decks add up as their fingerprint."""
+
+    __slots__ = ('name', 'color', 'id', 'key')
 
     valid_colors = ['blue', 'yellow', 'black', 'green', 'red']
+    interned = {}  # (name, color) -> Card
+    registry = []  # id -> Card
+    lock = threading.Lock()  # Held while a new Card is interned
 
-    def __init__(self, name, color):
-        if isinstance(name, str) and len(name) < 20:
-            self.name = name
-        else:
+    def __new__(cls, name, color):
+        if not isinstance(name, str) or len(name) >= 20:
             raise ValueError('Card name not a string or string too long')
 
-        if color in Card.valid_colors:
-            self.color = color
-        else:
+        if color not in Card.valid_colors:
             raise ValueError('Card color invalid')
 
+        card = cls.interned.get((name, color))
+        if card is not None:
+            return card
+        # Cards are also unpickled in threads, which must not get the same id
+        with cls.lock:
+            card = cls.interned.get((name, color))
+            if card is None:
+                card = super().__new__(cls)
+                object.__setattr__(card, 'name', name)
+                object.__setattr__(card, 'color', color)
+                object.__setattr__(card, 'id', len(cls.registry))
+                digest = hashlib.blake2b(f'{name}\0{color}'.encode(),
+                                         digest_size=8).digest()
+                object.__setattr__(card, 'key',
+                                   int.from_bytes(digest, 'little'))
+                cls.registry.append(card)
+                cls.interned[(name, color)] = card
+        return card
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Card objects are immutable')
+
+    def __reduce__(self):
+        # Pickled Cards are interned again when loaded
+        return Card, (self.name, self.color)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f'Card({self.name!r}, {self.color!r})'
+
 
 class Deck:
-    """Defines a list Card objects.
+    """Defines a multiset of Card objects.
     There are three decks in the game:
     - Discard Deck
     - Exile Deck
-    - Draw Deck (special case, subclassed below)"""
+    - Draw Deck (special case, subclassed below)
+
+    Cards are stored as a count array indexed by Card id,
+    so adding, removing and counting cards are O(1)
+    and iterating over unique cards is O(unique cards).
+    Copies share the count array until either Deck changes.
+    The fingerprint is updated on every change and only depends on
+    the contents, so Decks with the same cards share a fingerprint."""
 
     def __init__(self, name):
         if isinstance(name, str):
@@ -44,21 +115,52 @@ class Deck:
         else:
             raise ValueError(f'"{name}" is not a valid deck name')
 
-        self.cards = []
         self.parent = None  # References parent Draw Deck if applicable
+        self.listeners = []
+        self.version = 0    # Incremented on every change to the Deck
+        self._frozen = None  # (version, frozen contents) cache
+        self.clear()
+
+    def subscribe(self, listener):
+        """Register a callable to be notified of changes to the Deck.
+        It is called with the changed Deck, the Card and the change
+        in its count, or with a None Card if the Deck was rebuilt."""
+        self.listeners.append(listener)
+
+    def notify(self, deck, card, delta):
+        self.version += 1
+        for listener in self.listeners:
+            listener(deck, card, delta)
 
     def add(self, card, **kwargs):
         """Add a card to the Deck."""
         if isinstance(card, Card):
-            self.cards.append(card)
+            if self._shared:
+                self._own()
+            if card.id >= len(self.counts):
+                self.counts.extend([0] * (card.id + 1 - len(self.counts)))
+            if not self.counts[card.id]:
+                self._unique[card] = None
+                self._names[card.name] = card
+            self.counts[card.id] += 1
+            self.size += 1
+            self.fingerprint = (self.fingerprint + card.key) & MASK
+            self.notify(self, card, 1)
         else:
             raise ValueError(f'"{card}" cannot be added to a Deck')
 
     def remove(self, card):
         """Remove a card from the Deck."""
-        # assert card in self.cards, f'{card.name} not in {self.name}'
-        if card in self.cards:
-            self.cards.remove(card)
+        if self.count(card):
+            if self._shared:
+                self._own()
+            self.counts[card.id] -= 1
+            if not self.counts[card.id]:
+                del self._unique[card]
+                del self._names[card.name]
+            self.size -= 1
+            self.fingerprint = (self.fingerprint - card.key) & MASK
+            self.notify(self, card, -1)
         else:
             raise ValueError(f'"{card.name}" is not in Deck {self.name}')
 
@@ -70,95 +172,278 @@ class Deck:
         to_deck.add(card, **kwargs)
 
     def clear(self):
-        self.cards.clear()
+        self.counts = []      # Card id -> number of copies in the Deck
+        self._unique = {}     # Cards in the Deck, in order of addition
+        self._names = {}      # Card name -> Card, for the same cards
+        self.size = 0
+        self.fingerprint = 0  # Sum of the keys of the cards, modulo 2**64
+        self._shared = False  # True if the counts are shared with a copy
+        self.notify(self, None, 0)
+
+    def copy(self, name=None):
+        """Return a copy of the Deck. The copy shares the card counts
+        of this Deck until one of them changes (copy-on-write)."""
+        deck = Deck(self.name if name is None else name)
+        deck.counts, deck._unique, deck._names, deck.size = \
+            self.counts, self._unique, self._names, self.size
+        deck.fingerprint = self.fingerprint
+        deck._shared = self._shared = True
+        return deck
+
+    def _own(self):
+        # Take a private copy of shared card counts before changing them
+        self.counts = self.counts.copy()
+        self._unique = self._unique.copy()
+        self._names = self._names.copy()
+        self._shared = False
+
+    def freeze(self):
+        """Return the contents of the Deck as an immutable tuple
+        of (card, count) pairs. The tuple is cached until the Deck
+        changes, so unchanged Decks always return the same object."""
+        if self._frozen is None or self._frozen[0] != self.version:
+            self._frozen = (self.version, tuple(self.items()))
+        return self._frozen[1]
+
+    def load(self, frozen):
+        """Replace the contents of the Deck with frozen (card, count)
+        pairs, as returned by freeze()."""
+        counts = [0] * (max((card.id for card, count in frozen),
+                            default=-1) + 1)
+        for card, count in frozen:
+            counts[card.id] = count
+        self.counts = counts
+        self._unique = dict.fromkeys(card for card, count in frozen)
+        self._names = {card.name: card for card, count in frozen}
+        self.size = sum(counts)
+        self.fingerprint = sum(card.key * count
+                               for card, count in frozen) & MASK
+        self._shared = False
+        self.notify(self, None, 0)
+        self._frozen = (self.version, frozen)
+
+    def count(self, card):
+        """Return the number of copies of a card in the Deck."""
+        return self.counts[card.id] if card.id < len(self.counts) else 0
+
+    def find(self, name):
+        """Return the card with a name in the Deck, or None."""
+        return self._names.get(name)
+
+    def unique(self):
+        """Return the unique cards in the Deck, in order of addition."""
+        return self._unique.keys()
+
+    def items(self):
+        """Return (card, count) pairs for the unique cards in the Deck."""
+        return [(card, self.counts[card.id]) for card in self._unique]
+
+    @property
+    def cards(self):
+        """List every card in the Deck, repeating duplicate cards."""
+        return list(self)
 
     def sorted(self):
-        return sorted(self.cards, key=lambda x: x.name)
+        return [card for card in sorted(self._unique, key=lambda x: x.name)
+                for i in range(self.counts[card.id])]
 
     def is_empty(self):
-        return False if self.cards else True
+        return False if self.size else True
 
     def has_parent(self):
         return True if self.parent else False
 
     def __len__(self):
-        return len(self.cards)
+        return self.size
+
+    def __contains__(self, card):
+        return card in self._unique
 
     def __iter__(self):
-        return iter(self.cards)
+        for card in self._unique:
+            for i in range(self.counts[card.id]):
+                yield card
 
 
 class DrawDeck(Deck):
     """Subclass of Deck used for the Draw Deck only.
-    The Draw Deck doesn't hold Card objects, but a list of Decks objects,
-    which represent the potential cards for each draw."""
+    The Draw Deck doesn't hold Card objects, but Deck objects
+    which represent the potential cards for each draw.
+    Consecutive draws from the same Deck are stored as a single segment,
+    a [deck, count] pair, in a deque ordered from bottom to top.
+    The fingerprint is the sum of the segment keys, which depend on
+    the pool fingerprint, the draw count and the depth of the segment."""
 
     def __init__(self, name):
         super().__init__(name)
 
+    def _segment_key(self, depth):
+        if depth >= len(self.segments):
+            return 0
+        deck, count = self.segments[depth]
+        return segment_key(deck.fingerprint, count, depth)
+
+    def _rehash(self, depth, before):
+        # Replace the key of a segment after it changed
+        self.fingerprint = (self.fingerprint - before +
+                            self._segment_key(depth)) & MASK
+
+    def _hash(self):
+        self.fingerprint = sum(self._segment_key(depth) for depth
+                               in range(len(self.segments))) & MASK
+
     def add(self, item, **kwargs):
         # Override Deck.add.
         # If the added item is a Deck (i.e. after an epidemic),
-        # add as many copies of it as the number of cards it contains.
+        # add it as a new top segment covering as many draws
+        # as the number of cards it contains.
         if isinstance(item, Deck):
-            for i in item.cards:
-                self.cards.append(item)
+            self.segments.append([item, len(item)])
+            self.size += len(item)
+            self._rehash(len(self.segments) - 1, 0)
             item.parent = self
+            self.notify(item, None, 0)
         # If the added item is a Card,
         # add it to the Deck at the required position
-        # and insert an instance of the Deck at that position.
+        # and extend the segment of that Deck by one draw.
         else:
             pos = kwargs['position']
             assert pos != 'deck', f'Invalid Draw Deck destination'
-            deck = None
 
             if self.is_empty() or pos == 'single':
                 deck = Deck('Single card')
+                deck.add(item)
+                deck.parent = self
+                self.segments.append([deck, 1])
+                self._rehash(len(self.segments) - 1, 0)
             elif pos == 'top':
+                depth = len(self.segments) - 1
+                before = self._segment_key(depth)
                 deck = self.top()
+                deck.add(item)
+                self.segments[-1][1] += 1
+                self._rehash(depth, before)
             elif pos == 'bottom':
+                before = self._segment_key(0)
                 deck = self.bottom()
-
-            deck.add(item)
-
-            if pos == 'bottom':
-                self.cards.insert(0, deck)
+                deck.add(item)
+                self.segments[0][1] += 1
+                self._rehash(0, before)
             else:
-                self.cards.append(deck)
+                raise ValueError(f'Invalid Draw Deck position "{pos}"')
 
-            assert deck is not None, f'Invalid Draw Deck state'
-            deck.parent = self
+            self.size += 1
+            self.notify(deck, item, 1)
 
     def remove(self, card):
         # Override Deck.remove:
         # Remove the card from the top of the deck
         # so that it's excluded from future possible draws,
-        # then removes the Deck itself from the Draw Deck.
-        self.top().remove(card)
-        self.cards.pop()
+        # then shorten the top segment by one draw.
+        depth = len(self.segments) - 1
+        before = self._segment_key(depth)
+        deck = self.top()
+        deck.remove(card)
+        self.size -= 1
+        self.segments[-1][1] -= 1
+        if not self.segments[-1][1]:
+            self.segments.pop()
+        self._rehash(depth, before)
+        self.notify(deck, card, -1)
 
     def get_card_from_bottom(self, name):
-        list = self.bottom().cards
-        found = next((card for card in list if card.name == name), None)
+        found = self.bottom().find(name)
         assert found is not None,\
             f'Card with name "{name}" not found in Deck "{self.name}".'
         return found
 
     def remove_from_bottom(self, card):
         # Remove a card from the bottom of the draw deck,
-        # i.e. from list position 0,
-        # then remove the list item entirely because the card was drawn.
-        self.bottom().remove(card)
-        self.cards.pop(0)
+        # then shorten the bottom segment because the card was drawn.
+        before = self._segment_key(0)
+        deck = self.bottom()
+        deck.remove(card)
+        self.size -= 1
+        self.segments[0][1] -= 1
+        if self.segments[0][1]:
+            self._rehash(0, before)
+        else:
+            # Every segment moves down one depth
+            self.segments.popleft()
+            self._hash()
+        self.notify(deck, card, -1)
+
+    def clear(self):
+        self.segments = deque()
+        self.size = 0
+        self.fingerprint = 0
+        self.notify(None, None, 0)
 
     def sorted(self):
         # Override Deck.sorted to return
         # a sorted list of unique possible cards
-        # at the top (last) position in the Deck.
-        return sorted(set(self.cards[-1].cards), key=lambda x: x.name)
+        # at the top position in the Deck.
+        return sorted(self.top().unique(), key=lambda x: x.name)
+
+    def pool_at(self, position):
+        """Return the Deck of possible cards for the draw
+        at the given position, counting from 0 at the top."""
+        if not 0 <= position < self.size:
+            raise IndexError(f'No draw at position {position} in {self.name}')
+        for deck, count in reversed(self.segments):
+            if position < count:
+                return deck
+            position -= count
+
+    def copy(self, name=None):
+        # Override Deck.copy to copy the segments.
+        # Their pools are copy-on-write, so this is O(segments).
+        deck = DrawDeck(self.name if name is None else name)
+        for pool, count in self.segments:
+            copy = pool.copy()
+            copy.parent = deck
+            deck.segments.append([copy, count])
+        deck.size = self.size
+        deck.fingerprint = self.fingerprint
+        return deck
+
+    def freeze(self):
+        # Override Deck.freeze to return a tuple of
+        # (name, frozen deck, count) segments, from bottom to top.
+        if self._frozen is None or self._frozen[0] != self.version:
+            self._frozen = (self.version, tuple(
+                (deck.name, deck.freeze(), count)
+                for deck, count in self.segments))
+        return self._frozen[1]
+
+    def load(self, frozen):
+        # Override Deck.load to rebuild the segments
+        # from the frozen segments returned by freeze().
+        self.segments = deque()
+        for name, cards, count in frozen:
+            deck = Deck(name)
+            deck.load(cards)
+            deck.parent = self
+            self.segments.append([deck, count])
+        self.size = sum(count for name, cards, count in frozen)
+        self._hash()
+        self.notify(None, None, 0)
+        self._frozen = (self.version, frozen)
+
+    def is_empty(self):
+        return not self.segments
 
     def top(self):
-        return self.cards[-1]
+        return self.segments[-1][0]
 
     def bottom(self):
-        return self.cards[0]
+        return self.segments[0][0]
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        # Iterate over the Deck of every draw, from bottom to top
+        for deck, count in self.segments:
+            for i in range(count):
+                yield deck
@@ -0,0 +1,173 @@
+"""
+Headless scripting API for tracking a Game without the Qt interface.
+
+Cards are referred to by name, the way they are called at the table,
+and card destinations use the names of the Card Destination radio
+buttons of the GUI:
+
+    engine = Engine()
+    engine.new_game('Pandemic')
+    engine.infect('Lagos')
+    engine.move('Paris', 'discard', 'top')
+    engine.epidemic('Milan')
+    engine.chance('Lagos', draws=3)
+
+Nothing here imports PySide2.
+"""
+
+import re
+
+from decks import Card
+from game import Game
+
+
+# Destination name -> (Game deck name, Draw Deck position)
+DESTINATIONS = {
+    'top': ('draw', 'top'),
+    'bottom': ('draw', 'bottom'),
+    'single': ('draw', 'single'),
+    'discard': ('discard', 'deck'),
+    'exclude': ('exclude', 'deck'),
+}
+
+
+class Engine:
+    """Drives a Game with card and deck names."""
+
+    def __init__(self, game=None):
+        self.game = game if game is not None else Game()
+        self.title = None
+
+    @property
+    def titles(self):
+        return list(self.game.games)
+
+    def new_game(self, title):
+        if title not in self.game.games:
+            raise ValueError(f'Unknown game "{title}"')
+        self.game.initialise(title)
+        self.title = title
+
+    def deck(self, name):
+        """Return a Game deck, checking that a game has started."""
+        if self.game.deck is None:
+            raise ValueError('No game in progress')
+        if name not in self.game.deck:
+            raise ValueError(f'Unknown deck "{name}"')
+        return self.game.deck[name]
+
+    def card(self, name, deck='draw'):
+        """Return the Card with a name (ignoring case) from a deck.
+        Cards are taken from the top of the Draw Deck."""
+        source = self.deck(deck)
+        if deck == 'draw':
+            cards = () if source.is_empty() else source.top().unique()
+        else:
+            cards = source.unique()
+        return self.find(name, cards, deck)
+
+    def game_card(self, name):
+        """Return the Card with a name from anywhere in the game."""
+        cards = {card for deck in self.game.deck.values()
+                 for pool in self.pools(deck) for card in pool.unique()}
+        return self.find(name, cards, 'game')
+
+    @staticmethod
+    def pools(deck):
+        if deck.name == 'draw':
+            return [pool for pool, count in deck.segments]
+        return [deck]
+
+    @staticmethod
+    def find(name, cards, deck):
+        found = next((card for card in cards
+                      if card.name.lower() == name.lower()), None)
+        if found is None:
+            raise ValueError(f'"{name}" is not in Deck {deck}')
+        return found
+
+    def move(self, name, source, destination):
+        """Move a card from a deck to one of the DESTINATIONS."""
+        if destination not in DESTINATIONS:
+            raise ValueError(f'Unknown destination "{destination}"')
+        to, position = DESTINATIONS[destination]
+        from_deck, to_deck = self.deck(source), self.deck(to)
+        if from_deck == to_deck:
+            raise ValueError(f'Cannot move a card from {source} onto itself')
+        card = self.card(name, source)
+        self.game.draw_card(from_deck, to_deck, card, position=position)
+        return card
+
+    def infect(self, name, destination='discard'):
+        """Draw a card from the top of the Draw Deck."""
+        return self.move(name, 'draw', destination)
+
+    def epidemic(self, name):
+        """Draw a card from the bottom of the Draw Deck
+        and shuffle the discard pile back on top."""
+        draw = self.deck('draw')
+        if draw.is_empty():
+            raise ValueError('The Draw Deck is empty')
+        card = self.find(name, draw.bottom().unique(), 'draw (bottom)')
+        self.game.epidemic(card.name)
+        return card
+
+    def undo(self):
+        """Undo the last action. Returns False if there was none."""
+        if not self.game.history.can_undo():
+            return False
+        self.game.undo()
+        return True
+
+    def redo(self):
+        """Redo the last undone action. Returns False if there was none."""
+        if not self.game.history.can_redo():
+            return False
+        self.game.redo()
+        return True
+
+    def stats(self):
+        """Return the statistics shown in the Stats panel."""
+        stats = self.game.stats
+        draw = self.deck('draw')
+        result = {'total': stats.total,
+                  'in_discard': stats.in_discard,
+                  'in_draw': len(draw)}
+        if not draw.is_empty():
+            result['top_probability'] = stats.percentage
+            result['top_cards'] = sorted(c.name for c in stats.top_cards)
+            result['top_freq'] = stats.top_freq
+        return result
+
+    def chance(self, target, draws):
+        """Return the chance of drawing, within the next draws, a card
+        or any card of a list of names, or any card of a color."""
+        self.deck('draw')
+        forecast = self.game.stats.forecast
+        if target in Card.valid_colors:
+            return forecast.color(target, draws)
+        names = [target] if isinstance(target, str) else target
+        return forecast.cities([self.game_card(n) for n in names], draws)
+
+    def pool(self, position=0):
+        """Return (name, count, probability) for the possible cards
+        at a draw position, counted from 0 at the top."""
+        pool = self.deck('draw').pool_at(position)
+        odds = self.game.stats.positions.row(position)
+        return [(card.name, pool.count(card), p) for card, p in odds]
+
+    def cards(self, deck):
+        """Return (name, count) pairs for a deck, or for the top
+        of the Draw Deck, sorted by name."""
+        source = self.deck(deck)
+        if deck == 'draw':
+            if source.is_empty():
+                return []
+            source = source.top()
+        return [(card.name, source.count(card))
+                for card in sorted(source.unique(), key=lambda x: x.name)]
+
+    def log(self):
+        """Return the game log as plain text."""
+        return [' '.join(re.sub(r'<[^>]+>', '', entry).split())
+                for entry in self.game.log]
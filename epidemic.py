@@ -20,17 +20,25 @@ __version__ = "1.0"
 
 
 # Qt framework
-from PySide2.QtWidgets import QApplication
+from PySide2.QtWidgets import QApplication, QShortcut
+from PySide2.QtGui import QKeySequence
 from PySide2.QtCore import QTimer
 
 # Application modules
-from game import Game
+from game import Game, Move
+from journal import Journal
+from metrics import metrics, from_environment
 from qt import MainWindow
-from qtdialogs import DialogHelp, DialogNewGame
+from store import Store, STORE_FILE
+from qtdialogs import DialogHelp, DialogLog, DialogNewGame
+import utility
+from workers import Workers, color_chances, pool_chances, FORECAST_DRAWS
 
 # Other modules
 from webbrowser import open as webopen
 from enum import Enum
+import os
+import re
 
 import logging
 logging.basicConfig(
@@ -38,15 +46,44 @@ logging.basicConfig(
 logging.disable()
 
 
+METRICS_FILE = 'metrics.json'
+
+# Panels refreshed by App.flush, in this order
+PANELS = ('pool_selector', 'epidemic_menu', 'stats', 'cardpool',
+          'history_buttons')
+
+
 class App:
-    def __init__(self, game, view):
+    def __init__(self, game, view, journal=None, store=None):
         logging.info('[App] init')
         self.game = game
         self.view = view
         self.game.log.view = self.view.log
+        self.journal = journal
+        if self.journal is not None:
+            self.journal.attach(self.game)
+        self.store = store
+        if self.store is not None:
+            self.store.attach(self.game)
         self._cardpool_index = 0
+        self.moves = []     # Moves queued in multi-select mode
+
+        # Panels are marked dirty and redrawn once per event loop pass
+        self.dirty = set()
+        self.flush_timer = QTimer()
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(0)
+        self.flush_timer.timeout.connect(self.flush)
+
+        # Probabilities are computed in the background, on a snapshot,
+        # and the jobs are cancelled by every move
+        self.workers = Workers()
+        self.workers.color_chances.connect(self.show_color_chances)
+        self.workers.pool_chances.connect(self.show_pool_chances)
+        self.game.subscribe(self.workers.cancel)
 
         self.bind_sidebar_buttons()
+        self.bind_deck_views()
         QTimer.singleShot(0, self.cb_new_game_dialog)
 
     @property
@@ -65,7 +102,7 @@ class App:
             self.view.pool_selector.button[new_index].set_active(
                 True)
             self._cardpool_index = new_index
-            self.update_cardpool()
+            self.schedule('cardpool')
         else:
             raise ValueError('Integer expected for cardpool index')
 
@@ -75,82 +112,160 @@ class App:
         new_game.clicked.connect(self.cb_new_game_dialog)
         help = self.view.app_buttons.button_help
         help.clicked.connect(self.cb_help_dialog)
+        self.view.app_buttons.button_log.clicked.connect(self.cb_log_dialog)
         epidemic = self.view.epidemic_menu.button
         epidemic.clicked.connect(self.cb_epidemic)
+        self.view.epidemic_menu.highlighted.connect(self.cb_preview_epidemic)
+        undo = self.view.app_buttons.button_undo
+        undo.clicked.connect(self.cb_undo)
+        redo = self.view.app_buttons.button_redo
+        redo.clicked.connect(self.cb_redo)
+        selection = self.view.selection
+        selection.checkbox.toggled.connect(self.cb_clear_moves)
+        selection.button_apply.clicked.connect(self.cb_apply_moves)
+        selection.button_clear.clicked.connect(self.cb_clear_moves)
+        QShortcut(QKeySequence.Undo, self.view, self.cb_undo)
+        QShortcut(QKeySequence.Redo, self.view, self.cb_redo)
+        QShortcut(QKeySequence('Ctrl+Shift+M'), self.view, self.cb_metrics)
+
+    def bind_deck_views(self):
+        logging.info('Binding deck views')
+        for name, view in self.view.deck.items():
+            view.card_clicked.connect(
+                lambda card, n=name: self.cb_draw_card(
+                    card, self.game.deck[n]))
+            view.card_entered.connect(
+                lambda card, n=name: self.cb_preview_card(
+                    card, self.game.deck[n]))
 
     def populate_draw(self):
-        logging.info(f'Populating Draw Deck')
-        self.view.deck['draw'].clear()
+        logging.info('Populating Draw Deck')
         deck = self.game.deck['draw']
-        if not deck.is_empty():
-            cards = deck.sorted()
-            for card in cards:
-                button = self.view.deck['draw'].add_card_button(card)
-                button.clicked.connect(
-                    lambda b=button, d=deck: self.cb_draw_card(b, d))
+        cards = [] if deck.is_empty() else deck.sorted()
+        self.view.deck['draw'].update_cards(cards)
 
-    @staticmethod
-    def is_last_card(deck):
-        return True if deck.name == 'draw' and len(deck.top()) == 1 else False
+    def populate_deck(self, name):
+        """Rebuild the rows of the discard or exclude deck."""
+        logging.info('Populating %s deck', name)
+        self.view.deck[name].clear()
+        for card in self.game.deck[name].sorted():
+            self.view.deck[name].add_card(card)
 
-    def cb_draw_card(self, button, from_deck):
+    def cb_draw_card(self, card, from_deck):
         logging.info('Drawing Card')
         # Get the deck we're drawing to
         to_deck, position = self.get_destination()
 
         # Ignore drawing from a deck onto itself
-        if not from_deck == to_deck and not from_deck == to_deck.parent:
-            self.draw_card(button, from_deck, to_deck, position)
-
-    def draw_card(self, button, from_deck, to_deck, position):
-        logging.info(
-            f'Drawing {button.card.name} ({from_deck.name} -> {to_deck.name})')
-
-        card = button.card
+        if from_deck == to_deck or from_deck == to_deck.parent:
+            return
+        if self.view.selection.is_active():
+            self.moves.append(
+                Move(card, from_deck.name, to_deck.name, position))
+            self.view.selection.show(self.moves)
+        else:
+            self.draw_card(card, from_deck, to_deck, position)
 
-        # Flag needed to populate draw if last button was removed
-        is_last_card = self.is_last_card(from_deck)
+    def draw_card(self, card, from_deck, to_deck, position):
+        logging.info('Drawing %s (%s -> %s)',
+                     card.name, from_deck.name, to_deck.name)
 
         # Move the card and update the game state
         self.game.draw_card(from_deck, to_deck, card, position=position)
 
-        # Remove the card from the source deck in GUI
-        if from_deck.name == 'draw':
-            if from_deck.is_empty() or card not in from_deck.top():
-                self.remove_button_from_deck(button, from_deck)
-            if is_last_card:
-                self.populate_draw()
-        else:
-            self.remove_button_from_deck(button, from_deck)
+        # Apply the changes to the top cards of the Draw Deck in GUI
+        if self.game.deck['draw'] in (from_deck, to_deck):
+            self.populate_draw()
+
+        # Move the card between the other decks in GUI
+        if from_deck.name != 'draw':
+            self.remove_card_from_view(card, from_deck)
+        if to_deck.name != 'draw':
+            self.add_card_to_view(card, to_deck)
 
-        # Add the card to the GUI
-        if to_deck == self.game.deck['draw']:
+        # Clamp the active pool button to allowed range
+        self.cardpool_index = self.cardpool_index
+
+        self.update_gui()
+
+    def cb_preview_card(self, card, from_deck):
+        """Preview the stats after drawing the card under the mouse."""
+        to_deck, position = self.get_destination()
+        if from_deck == to_deck or from_deck == to_deck.parent:
+            return
+        try:
+            stats = self.game.preview_draw(card, from_deck.name,
+                                           to_deck.name, position)
+        except ValueError as e:
+            # The card may have moved since the view was drawn
+            logging.info('No preview: %s', e)
+            return
+        where = f'{to_deck.name} ({position})' \
+            if to_deck.name == 'draw' else to_deck.name
+        self.view.deck[from_deck.name].show_preview(
+            self.view.stats.render_preview(f'{card.name} -> {where}', stats))
+
+    def cb_preview_epidemic(self, index):
+        """Preview the stats after an epidemic with the highlighted card."""
+        if index < 0 or self.game.deck['draw'].is_empty():
+            return
+        name = self.view.epidemic_menu.name(index)
+        try:
+            stats = self.game.preview_epidemic(name)
+        except ValueError as e:
+            # The menu may not show the bottom pool yet
+            logging.info('No preview: %s', e)
+            return
+        self.view.epidemic_menu.show_preview(
+            self.view.stats.render_preview(f'Epidemic with {name}', stats))
+
+    def cb_apply_moves(self):
+        """Apply the queued moves as a single action."""
+        moves, self.moves = self.moves, []
+        self.view.selection.show(self.moves)
+        try:
+            self.apply_moves(moves)
+        except ValueError as e:
+            logging.info('Moves not applied: %s', e)
+            self.view.log.log(f'<i>Moves not applied: {e}</i>')
+
+    def cb_clear_moves(self):
+        self.moves = []
+        self.view.selection.show(self.moves)
+
+    def apply_moves(self, moves):
+        """Apply moves with Game.apply() and refresh the GUI once."""
+        logging.info('Applying %s moves', len(moves))
+        self.game.apply(moves)
+        for move in moves:
+            if move.source != 'draw':
+                self.remove_card_from_view(move.card,
+                                           self.game.deck[move.source])
+            if move.target != 'draw':
+                self.add_card_to_view(move.card, self.game.deck[move.target])
+        if any('draw' in (move.source, move.target) for move in moves):
             self.populate_draw()
-        else:
-            self.add_button_to_deck(button, to_deck)
 
         # Clamp the active pool button to allowed range
         self.cardpool_index = self.cardpool_index
 
         self.update_gui()
 
-    def add_button_to_deck(self, button, deck):
-        logging.info(f'Adding button {button.card.name} to {deck.name}')
-        button = self.view.deck[deck.name].add_card_button(button.card)
-        if button is not None:
-            button.clicked.connect(
-                lambda b=button, d=deck: self.cb_draw_card(b, d))
+    def add_card_to_view(self, card, deck):
+        logging.info('Adding card %s to %s view', card.name, deck.name)
+        self.view.deck[deck.name].add_card(card)
 
-    def remove_button_from_deck(self, button, deck):
-        logging.info(f'Removing button {button.card.name} from {deck.name}')
-        self.view.deck[deck.name].remove_card_button(button)
+    def remove_card_from_view(self, card, deck):
+        logging.info(
+            'Removing card %s from %s view', card.name, deck.name)
+        self.view.deck[deck.name].remove_card(card)
 
     def get_destination(self):
         """Return the Game Deck based on the selected radio button."""
         for item in self.view.destination:
             if self.view.destination[item].isChecked():
                 deck, position = self.splitter(item, '_')
-                logging.info(f'Destination: {deck} (Position: {position})')
+                logging.info('Destination: %s (Position: %s)', deck, position)
                 return (self.game.deck[deck], position)
 
     @staticmethod
@@ -161,19 +276,24 @@ class App:
             return (item, 'None')
 
     def update_cardpool(self):
-        logging.info(f'Updating cardpool')
+        logging.info('Updating cardpool')
         if self.game.deck['draw'].is_empty():
             self.view.cardpool.show_empty()
         else:
-            deck = self.game.deck['draw'].cards[-1-self.cardpool_index]
+            deck = self.game.deck['draw'].pool_at(self.cardpool_index)
             self.view.cardpool.show(deck.name, self.cardpool_index+1, deck)
+            self.workers.submit('pool_chances', pool_chances,
+                                self.game.snapshot(), self.cardpool_index)
+
+    def show_pool_chances(self, chances):
+        self.view.cardpool.show_chances(chances)
 
     def update_pool_selector(self):
-        logging.info(f'Updating pool selector')
+        logging.info('Updating pool selector')
         for i in range(self.view.top_cards):
             if i < len(self.game.deck['draw']):
-                c = self.game.deck['draw'].cards[-1-i]
-                text = f'{len(c)}' if len(c) > 1 else c.cards[0].name
+                c = self.game.deck['draw'].pool_at(i)
+                text = f'{len(c)}' if len(c) > 1 else c.sorted()[0].name
                 btn = self.view.pool_selector.button[i]
                 btn.setEnabled(True)
                 btn.set_text(text)
@@ -191,35 +311,40 @@ class App:
     def update_epidemic_menu(self):
         """Update the epidemic dropdown list
         based on the available cards in the Draw Deck."""
-        logging.info(f'Updating epidemic menu')
+        logging.info('Updating epidemic menu')
         deck = self.game.deck['draw']
         if not deck.is_empty():
-            items = sorted([c.name for c in list(set(deck.bottom().cards))])
-            self.view.epidemic_menu.combo_box.setDisabled(False)
-            self.view.epidemic_menu.button.setDisabled(False)
+            self.view.epidemic_menu.show(deck.bottom())
         else:
-            items = ['(Draw Deck Empty)']
-            self.view.epidemic_menu.combo_box.setDisabled(True)
-            self.view.epidemic_menu.button.setDisabled(True)
-
-        self.view.epidemic_menu.combo_box.clear()
-        self.view.epidemic_menu.combo_box.addItems(items)
+            self.view.epidemic_menu.show_empty()
 
     def update_stats(self):
         logging.info('Updating stats')
         self.view.stats.show(self.game.stats)
+        if not self.game.deck['draw'].is_empty():
+            self.workers.submit('color_chances', color_chances,
+                                self.game.snapshot(), FORECAST_DRAWS)
+
+    def show_color_chances(self, chances):
+        self.view.stats.show_chances(chances, FORECAST_DRAWS)
 
     def cb_select_cardpool(self, index):
-        logging.info(f'Selecting cardpool {index}')
+        logging.info('Selecting cardpool %s', index)
         self.cardpool_index = index
 
     def cb_new_game_dialog(self):
         logging.info('Displaying new game dialog')
         games = list(self.game.games.keys())
-        dialog = DialogNewGame(games)
+        dialog = DialogNewGame(games, self.can_resume())
         if dialog.exec_():
-            self.game.initialise(dialog.combo.currentText())
             self.view.initialise()
+            self.cb_clear_moves()
+            if dialog.resume:
+                self.resume()
+                self.populate_deck('discard')
+                self.populate_deck('exclude')
+            else:
+                self.game.initialise(dialog.combo.currentText())
             self.populate_draw()
             self.update_gui()
             self.cb_select_cardpool(0)
@@ -231,9 +356,27 @@ class App:
                 self.view.hide()
                 QTimer.singleShot(100, QApplication.quit)
 
+    def can_resume(self):
+        return (self.store is not None and
+                self.store.last_game() is not None) or \
+            (self.journal is not None and self.journal.has_game())
+
+    def resume(self):
+        """Restore the last game from the store, or from the journal
+        if there is no store."""
+        if self.store is not None and self.store.last_game() is not None:
+            self.store.resume()
+            if self.journal is not None:
+                self.journal.start()
+        else:
+            self.journal.restore()
+
     def cb_epidemic(self):
         """Shuffle epidemic card based on the selected card in the combobox."""
         logging.info('Starting epidemic')
+        # A click queued before the scheduled update sees a stale menu
+        if 'epidemic_menu' in self.dirty:
+            self.flush()
         new_card_name = self.view.epidemic_menu.combo_box.currentText()
         self.game.epidemic(new_card_name)
         self.view.deck['discard'].clear()
@@ -241,6 +384,26 @@ class App:
         self.update_gui()
         self.cb_select_cardpool(0)
 
+    def cb_undo(self):
+        logging.info('Undoing last action')
+        if self.game.history.can_undo():
+            self.game.undo()
+            self.refresh_decks()
+
+    def cb_redo(self):
+        logging.info('Redoing last action')
+        if self.game.history.can_redo():
+            self.game.redo()
+            self.refresh_decks()
+
+    def refresh_decks(self):
+        """Rebuild all deck columns after the game state was replaced."""
+        self.populate_draw()
+        self.populate_deck('discard')
+        self.populate_deck('exclude')
+        self.cardpool_index = self.cardpool_index
+        self.update_gui()
+
     @staticmethod
     def cb_help_dialog():
         logging.info('Displaying help dialog')
@@ -250,18 +413,78 @@ class App:
         if dialog.exec_():
             webopen('https://github.com/Merkwurdichliebe/Epidemic/wiki')
 
+    def cb_log_dialog(self):
+        """Show the whole history of the game from the journal,
+        or the recent log if there is no journal."""
+        logging.info('Displaying full log')
+        if self.journal is not None and self.journal.has_game():
+            lines = self.journal.history()
+        else:
+            lines = [' '.join(re.sub(r'<[^>]+>', '', entry).split())
+                     for entry in self.game.log]
+        DialogLog(lines).exec_()
+
+    def cb_metrics(self):
+        """Switch the latency metrics on or off.
+        Switching them off writes the report."""
+        if metrics.toggle():
+            self.view.log.log('<i>Metrics on</i>')
+        else:
+            path = self.save_metrics()
+            self.view.log.log(f'<i>Metrics off, report in {path}</i>')
+
+    def save_metrics(self):
+        """Write the metrics recorded so far, if any,
+        and return the path of the report."""
+        path = os.path.join(utility.get_data_dir(), METRICS_FILE)
+        if metrics.report():
+            metrics.export(path)
+            logging.info('Metrics:\n%s', metrics.format())
+        return path
+
+    def update_history_buttons(self):
+        self.view.app_buttons.button_undo.setEnabled(
+            self.game.history.can_undo())
+        self.view.app_buttons.button_redo.setEnabled(
+            self.game.history.can_redo())
+
+    def schedule(self, *panels):
+        """Mark panels for update (all of them by default).
+        They are redrawn together when control returns to the event loop,
+        however many times they were marked in the meantime."""
+        self.dirty.update(panels or PANELS)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        """Update the dirty panels."""
+        self.flush_timer.stop()
+        dirty, self.dirty = self.dirty, set()
+        logging.info('Updating panels: %s', dirty)
+        for panel in PANELS:
+            if panel in dirty:
+                getattr(self, f'update_{panel}')()
+
     def update_gui(self):
-        logging.info(f'Updating GUI')
-        self.update_pool_selector()
-        self.update_epidemic_menu()
-        self.update_stats()
+        logging.info('Updating GUI')
+        self.schedule()
 
 
 def main():
     application = QApplication()
     view = MainWindow()
     model = Game()
-    app = App(model, view)
+    journal = Journal(utility.get_data_dir())
+    application.aboutToQuit.connect(journal.close)
+    store = Store(os.path.join(utility.get_data_dir(), STORE_FILE))
+    application.aboutToQuit.connect(store.close)
+    metrics.instrument(Game, 'draw_card', 'epidemic', 'apply')
+    metrics.instrument(App, 'cb_*', 'update_*', 'populate_*', 'flush',
+                       'apply_moves')
+    from_environment()
+    app = App(model, view, journal, store)
+    application.aboutToQuit.connect(app.save_metrics)
+    application.aboutToQuit.connect(app.workers.shutdown)
     view.show()
     application.exec_()
 
@@ -1,28 +1,55 @@
 # Epidemic modules
-from decks import Card, Deck, DrawDeck
+from catalog import Catalog
+from decks import Deck, DrawDeck
+from history import History
 from stats import Stats
 import utility
 
 # Other modules
-from copy import deepcopy
-import yaml
+from collections import deque, namedtuple
+import itertools
 
 
 CARDS_FILE = 'data/cards.yml'
+LOG_LIMIT = 1000            # Entries kept in memory, the Journal has them all
+
+# A change to the game, sent to the Game observers. kind is 'new',
+# 'draw' (from the Draw Deck), 'move', 'epidemic', 'undo', 'redo'
+# or 'batch', whose events are the 'draw' and 'move' Events
+# of the moves applied together by Game.apply().
+Event = namedtuple('Event', 'kind card source target position events',
+                   defaults=((),))
+
+# A card move applied by Game.apply(), between decks named source
+# and target. position is required when the target is the Draw Deck.
+Move = namedtuple('Move', 'card source target position', defaults=(None,))
+
+# Immutable state of a Game, as returned by Game.snapshot()
+GameState = namedtuple(
+    'GameState', 'title total epidemic_count draw discard exclude')
 
 
 class Log:
-    def __init__(self):
-        self.entries = []
-        self.view = None
+    """The most recent log entries, oldest first."""
+
+    def __init__(self, limit=LOG_LIMIT):
+        self.entries = deque(maxlen=limit)
+        self.view = None    # Optional view, not used when running headless
 
     def clear(self):
         self.entries.clear()
-        self.view.clear()
+        if self.view is not None:
+            self.view.clear()
 
     def log(self, event):
         self.entries.append(event)
-        self.view.log(event)
+        if self.view is not None:
+            self.view.log(event)
+
+    def recent(self, count):
+        """Return the last entries, up to count."""
+        start = max(0, len(self.entries) - count)
+        return list(itertools.islice(self.entries, start, None))
 
     def __len__(self):
         return len(self.entries)
@@ -35,12 +62,24 @@ class Log:
 
 
 class Game:
-    def __init__(self):
-        self.games = self.get_all_games()
+    def __init__(self, games=None):
+        # Starter decks by title, shared by Games when passed in
+        self.games = games if games is not None else self.get_all_games()
+        self.title = None
         self.epidemic_count = None
         self.deck = None
         self.stats = None
         self.log = Log()
+        self.history = History()
+        self.observers = []
+
+    def subscribe(self, observer):
+        """Register a callable to be called with every game Event."""
+        self.observers.append(observer)
+
+    def emit(self, event):
+        for observer in self.observers:
+            observer(event)
 
     def initialise(self, game):
         """Prepare the initial state for the game. Initialise all decks.
@@ -53,73 +92,169 @@ class Game:
 
         self.deck = {deck.name: deck for deck in game_decks}
         self.stats = Stats(self.deck)
+        self.title = game
         self.epidemic_count = 0
+        self.history.clear()
         self.log.clear()
         self.log.log(f'<b>New game: {game}</b>\n')
+        self.emit(Event('new', None, None, None, None))
 
     def initialise_draw_deck(self, game):
         deck = DrawDeck('draw')
-        deck.add(deepcopy(self.games[game]))  # games list shouldn't mutate
+        deck.add(self.games[game].copy())  # Copy-on-write, games don't mutate
         return deck
 
     def draw_card(self, from_deck, to_deck, card, **kwargs):
         if not from_deck == to_deck:
+            state = self.snapshot()
             from_deck.move(card, to_deck, **kwargs)
+            self.history.record(state)
             self.log.log(
                 f'{card.name} ({from_deck.name} -> {to_deck.name})')
+            kind = 'draw' if from_deck.name == 'draw' else 'move'
+            self.emit(Event(kind, card, from_deck.name, to_deck.name,
+                            kwargs.get('position')))
+
+    def apply(self, moves):
+        """Apply card moves as a single action, with one undo step,
+        one log entry and one 'batch' Event. The moves are all applied
+        or, if one of them fails, none of them is."""
+        moves = [Move(*move) for move in moves]
+        for move in moves:
+            self.check_move(move)
+        if not moves:
+            return
+
+        state = self.snapshot()
+        try:
+            for move in moves:
+                self.deck[move.source].move(
+                    move.card, self.deck[move.target],
+                    position=move.position)
+        except (ValueError, IndexError):
+            self.load(state)
+            raise
+        self.history.record(state)
+        self.log.log(', '.join(
+            f'{move.card.name} ({move.source} -> {move.target})'
+            for move in moves))
+        self.emit(Event('batch', None, None, None, None, tuple(
+            Event('draw' if move.source == 'draw' else 'move', move.card,
+                  move.source, move.target, move.position)
+            for move in moves)))
+
+    def check_move(self, move):
+        """Raise ValueError if a Move doesn't go between two decks."""
+        if move.source not in self.deck or move.target not in self.deck:
+            raise ValueError(f'Invalid move {move.source} -> {move.target}')
+        if move.source == move.target:
+            raise ValueError(f'Cannot move {move.card.name} from '
+                             f'{move.source} onto itself')
+        if move.target == 'draw' and \
+                move.position not in ('top', 'bottom', 'single'):
+            raise ValueError(f'Invalid Draw Deck position "{move.position}"')
 
     def epidemic(self, card):
         """Draw a card from the bottom of the Draw Deck, discard it
         and shuffle the discard pile back onto the top of the Draw Deck."""
         new_card = self.deck['draw'].get_card_from_bottom(card)
+        self.history.record(self.snapshot())
+        self.shuffle_epidemic(new_card)
+        self.log.log(
+            f'<b>Epidemic #{self.epidemic_count} ({new_card.name})\
+                shuffled</b>')
+        self.emit(Event('epidemic', new_card, 'draw', 'discard', 'bottom'))
+
+    def shuffle_epidemic(self, new_card):
+        # Change the decks for an epidemic with a card from the bottom
         self.deck['draw'].remove_from_bottom(new_card)
         self.deck['discard'].add(new_card)
         self.epidemic_count += 1
 
-        # Create new card pool
-        new_cards = Deck(f'Epidemic #{self.epidemic_count}')
-        for card in self.deck['discard'].cards.copy():
-            new_cards.add(card)
+        # The discard pile becomes the new card pool. It is copied
+        # on write, and clearing the discard pile doesn't write.
+        new_cards = self.deck['discard'].copy(
+            f'Epidemic #{self.epidemic_count}')
         self.deck['draw'].add(new_cards)
-
-        # Clear the discard pile
         self.deck['discard'].clear()
-        self.log.log(
-            f'<b>Epidemic #{self.epidemic_count} ({new_card.name})\
-                shuffled</b>')
-
-    def get_all_games(self):
-        # Initialize the initial deck from the card list in cards.yml
-        game = {}
-        data = self.read_data_file()
-        try:
-            for game_title in data.keys():
-                game[game_title] = self.create_deck(game_title, data)
-        except ValueError:
-            raise  # Raise the error again to stop execution
 
+    def fork(self):
+        """Return a Game on copy-on-write copies of the decks, to try
+        moves without changing this one. The fork shares the starter
+        decks, and has no observers and no undo history."""
+        game = Game(self.games)
+        game.deck = {name: deck.copy() for name, deck in self.deck.items()}
+        game.stats = Stats(game.deck, total=self.stats.total)
+        game.title = self.title
+        game.epidemic_count = self.epidemic_count
         return game
 
-    @staticmethod
-    def create_deck(game_title, data):
-        deck = Deck('Starter Deck')
-        for item in data[game_title]:
-            if item['color'] not in Card.valid_colors:
-                raise ValueError(f"Invalid color '{item['color']}' in "
-                                 f"'{game_title} : {item['name']}'")
-            else:
-                card = Card(item['name'], item['color'])
-                for i in range(item['count']):
-                    deck.add(card)
-        return deck
+    def preview_draw(self, card, source, target, position=None):
+        """Return the Stats of the game after moving a card between
+        the decks named source and target, without changing the game."""
+        self.check_move(Move(card, source, target, position))
+        deck = self.deck[source]
+        if source == 'draw':
+            deck = None if deck.is_empty() else deck.top()
+        if deck is None or not deck.count(card):
+            raise ValueError(f'"{card.name}" is not in Deck {source}')
+        fork = self.fork()
+        fork.deck[source].move(card, fork.deck[target], position=position)
+        return fork.stats
+
+    def preview_epidemic(self, card):
+        """Return the Stats of the game after an epidemic with a card
+        name from the bottom of the Draw Deck, without changing the game."""
+        draw = self.deck['draw']
+        if draw.is_empty() or draw.bottom().find(card) is None:
+            raise ValueError(f'"{card}" is not at the bottom of the Draw Deck')
+        fork = self.fork()
+        fork.shuffle_epidemic(fork.deck['draw'].get_card_from_bottom(card))
+        return fork.stats
+
+    def snapshot(self):
+        """Return the current state of the game as a GameState."""
+        return GameState(self.title, self.stats.total, self.epidemic_count,
+                         self.deck['draw'].freeze(),
+                         self.deck['discard'].freeze(),
+                         self.deck['exclude'].freeze())
+
+    def restore(self, state):
+        """Restore a GameState returned by snapshot() as a new starting
+        point, without undo history."""
+        self.load(state)
+        self.history.clear()
+
+    def undo(self):
+        """Return to the state before the last action."""
+        if self.history.can_undo():
+            self.load(self.history.undo(self.snapshot()))
+            self.log.log('<i>Undo</i>')
+            self.emit(Event('undo', None, None, None, None))
+
+    def redo(self):
+        """Apply the last undone action again."""
+        if self.history.can_redo():
+            self.load(self.history.redo(self.snapshot()))
+            self.log.log('<i>Redo</i>')
+            self.emit(Event('redo', None, None, None, None))
+
+    def load(self, state):
+        # Load a GameState into the decks.
+        # The current decks are reloaded in place if a game is running.
+        if self.deck is None:
+            game_decks = [DrawDeck('draw'), Deck('discard'), Deck('exclude')]
+            self.deck = {deck.name: deck for deck in game_decks}
+        self.deck['draw'].load(state.draw)
+        self.deck['discard'].load(state.discard)
+        self.deck['exclude'].load(state.exclude)
+        if self.stats is None or self.stats.deck is not self.deck:
+            self.stats = Stats(self.deck, total=state.total)
+        self.stats.total = state.total
+        self.title = state.title
+        self.epidemic_count = state.epidemic_count
 
     @staticmethod
-    def read_data_file():
-        file = utility.get_path(CARDS_FILE)
-        try:
-            with open(file, encoding='utf-8') as f:
-                data = yaml.load(f, Loader=yaml.FullLoader)
-        except FileNotFoundError as e:
-            print(f'Missing or damaged cards.yml configuration file\n({e})')
-        else:
-            return data
+    def get_all_games():
+        # Load the starter decks of every game in cards.yml
+        return Catalog(utility.get_path(CARDS_FILE))
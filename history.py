@@ -0,0 +1,49 @@
+"""
+Undo and redo history of a Game.
+
+The history stores GameState snapshots. Snapshots are built from the
+frozen contents of each Deck, which are cached until the Deck changes,
+so consecutive states share every segment that an action didn't touch
+and each entry only costs the changed segments.
+"""
+
+from collections import deque
+
+
+HISTORY_LIMIT = 500     # Maximum number of undo (and redo) steps
+
+
+class History:
+    """Bounded undo and redo stacks of GameStates."""
+
+    def __init__(self, limit=HISTORY_LIMIT):
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = deque(maxlen=limit)
+
+    def record(self, state):
+        """Save the state before an action. This clears the redo stack."""
+        self.undo_stack.append(state)
+        self.redo_stack.clear()
+
+    def undo(self, current):
+        """Return the previous state, saving the current one for redo."""
+        self.redo_stack.append(current)
+        return self.undo_stack.pop()
+
+    def redo(self, current):
+        """Return the next state, saving the current one for undo."""
+        self.undo_stack.append(current)
+        return self.redo_stack.pop()
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    def __len__(self):
+        return len(self.undo_stack)
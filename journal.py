@@ -0,0 +1,280 @@
+"""
+Append-only journal of game events, for crash recovery.
+
+Every draw, move and epidemic of the current game is written to
+journal.bin as a compact binary record, and the file is synced to disk
+in batches. Every few hundred events, the whole game state is written
+to snapshot.bin together with the journal offset it corresponds to,
+so restoring a game loads the snapshot and replays only the events
+written after it.
+
+Record layout (little-endian):
+    kind, source deck, target deck, position, color   5 x uint8
+    time (seconds since the epoch)                    uint32
+    card name length, card name (UTF-8)               uint8, bytes
+
+Undo and redo are marker records without a card. The moves of a batch
+follow a batch marker whose name is their number, in decimal.
+"""
+
+import os
+import pickle
+import struct
+import time
+
+from decks import Card
+from game import Event, Move
+
+import logging
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = 'journal.bin'
+SNAPSHOT_FILE = 'snapshot.bin'
+
+HEADER = struct.Struct('<5BIB')
+KINDS = ['draw', 'move', 'epidemic', 'undo', 'redo', 'batch']
+DECKS = ['draw', 'discard', 'exclude']
+POSITIONS = [None, 'top', 'bottom', 'single', 'deck']
+
+
+def encode(event, timestamp):
+    if event.kind == 'batch':
+        count = str(len(event.events)).encode()
+        return HEADER.pack(KINDS.index('batch'), 0, 0, 0, 0,
+                           int(timestamp), len(count)) + count + b''.join(
+            encode(move, timestamp) for move in event.events)
+    if event.card is None:
+        return HEADER.pack(KINDS.index(event.kind), 0, 0, 0, 0,
+                           int(timestamp), 0)
+    name = event.card.name.encode('utf-8')
+    return HEADER.pack(KINDS.index(event.kind),
+                       DECKS.index(event.source),
+                       DECKS.index(event.target),
+                       POSITIONS.index(event.position),
+                       Card.valid_colors.index(event.card.color),
+                       int(timestamp), len(name)) + name
+
+
+def decode_record(data, offset):
+    # Return (end offset, timestamp, Event) for the record at an offset,
+    # or None if it is incomplete. A batch marker is returned with
+    # the number of moves that follow it instead of an Event.
+    if offset + HEADER.size > len(data):
+        return None
+    kind, source, target, position, color, timestamp, length = \
+        HEADER.unpack_from(data, offset)
+    end = offset + HEADER.size + length
+    if end > len(data):
+        return None
+    name = data[offset + HEADER.size:end].decode('utf-8')
+    kind = KINDS[kind]
+    if kind == 'batch':
+        return end, timestamp, int(name)
+    if kind in ('undo', 'redo'):
+        return end, timestamp, Event(kind, None, None, None, None)
+    card = Card(name, Card.valid_colors[color])
+    return end, timestamp, Event(kind, card, DECKS[source], DECKS[target],
+                                 POSITIONS[position])
+
+
+def decode(data, offset=0):
+    """Decode the records in data from an offset.
+    Yields (end offset, timestamp, Event) for every complete record,
+    with the moves of a batch gathered in a single 'batch' Event."""
+    while True:
+        record = decode_record(data, offset)
+        if record is None:
+            break  # Partial record left by a crash
+        end, timestamp, event = record
+        if not isinstance(event, Event):
+            moves = []
+            for i in range(event):
+                record = decode_record(data, end)
+                if record is None:
+                    return  # Partial batch, dropped as a whole
+                end, _, move = record
+                moves.append(move)
+            event = Event('batch', None, None, None, None, tuple(moves))
+        yield end, timestamp, event
+        offset = end
+
+
+class Journal:
+    """Records the events of a Game in a directory."""
+
+    def __init__(self, path, sync_every=16, sync_interval=1.0,
+                 snapshot_every=200):
+        self.journal_path = os.path.join(path, JOURNAL_FILE)
+        self.snapshot_path = os.path.join(path, SNAPSHOT_FILE)
+        self.sync_every = sync_every          # Events between fsyncs
+        self.sync_interval = sync_interval    # Seconds between fsyncs
+        self.snapshot_every = snapshot_every  # Events between snapshots
+        self.game = None
+        self.file = None
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.since_snapshot = 0
+        self.replaying = False
+
+    def attach(self, game):
+        """Record the events of a Game from now on."""
+        self.game = game
+        game.subscribe(self.record)
+
+    def record(self, event):
+        if self.replaying:
+            return
+        if event.kind == 'new':
+            self.start()
+        elif event.kind in ('undo', 'redo'):
+            # The marker keeps history() right and replays start
+            # after the restored state
+            self.append(event)
+            self.snapshot()
+        else:
+            self.append(event)
+
+    def start(self):
+        """Start a new journal from the current game state."""
+        self.close()
+        self.file = open(self.journal_path, 'wb', buffering=0)
+        self.snapshot()
+
+    def append(self, event):
+        if self.file is None:
+            self.start()
+        self.file.write(encode(event, time.time()))
+        self.unsynced += 1
+        self.since_snapshot += 1
+        if self.unsynced >= self.sync_every or \
+                time.monotonic() - self.last_sync >= self.sync_interval:
+            self.sync()
+        if self.since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def sync(self):
+        if self.file is not None and self.unsynced:
+            os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def snapshot(self):
+        """Write the game state and the current journal offset."""
+        if self.file is None:
+            self.file = open(self.journal_path, 'ab', buffering=0)
+        self.sync()
+        data = pickle.dumps((self.file.tell(), self.game.snapshot()),
+                            pickle.HIGHEST_PROTOCOL)
+        temp = f'{self.snapshot_path}.tmp'
+        with open(temp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.snapshot_path)
+        self.since_snapshot = 0
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def has_game(self):
+        """Return True if there is a game to restore."""
+        return os.path.exists(self.snapshot_path)
+
+    def read_snapshot(self):
+        with open(self.snapshot_path, 'rb') as f:
+            return pickle.loads(f.read())
+
+    def read(self, offset=0):
+        """Return (timestamp, Event) for the journal records
+        from an offset."""
+        return [(timestamp, event) for end, timestamp, event
+                in self.read_records(offset)[1]]
+
+    def history(self):
+        """Return the log of the whole game as plain text lines,
+        including the entries that the Game log no longer keeps.
+        Undone actions are left out."""
+        offset, state = self.read_snapshot()
+        done, undone = [], []   # (timestamp, Event) of the actions
+        before = 0              # Epidemics done when the snapshot was taken
+        for end, timestamp, event in self.read_records(0)[1]:
+            if event.kind == 'undo':
+                if done:
+                    undone.append(done.pop())
+            elif event.kind == 'redo':
+                if undone:
+                    done.append(undone.pop())
+            else:
+                done.append((timestamp, event))
+                undone.clear()
+            if end == offset:
+                before = sum(event.kind == 'epidemic' for t, event in done)
+
+        # The journal may start after epidemics, on a resumed game
+        epidemics = state.epidemic_count - before
+        lines = []
+        for timestamp, event in done:
+            if event.kind == 'epidemic':
+                epidemics += 1
+                text = f'Epidemic #{epidemics} ({event.card.name}) shuffled'
+            else:
+                text = ', '.join(
+                    f'{move.card.name} ({move.source} -> {move.target})'
+                    for move in (event.events or [event]))
+            when = time.strftime('%H:%M:%S', time.localtime(timestamp))
+            lines.append(f'{when} {text}')
+        return lines
+
+    def read_records(self, offset):
+        # Returns the offset after the last complete record
+        # and the list of (end, timestamp, Event) records
+        try:
+            with open(self.journal_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return offset, []
+        records = list(decode(data, offset))
+        return (records[-1][0] if records else offset), records
+
+    def restore(self):
+        """Restore the attached game from the latest snapshot,
+        replay the events recorded after it and carry on journaling."""
+        game = self.game
+        offset, state = self.read_snapshot()
+        end, records = self.read_records(offset)
+        logger.info(f'Restoring {state.title}: {len(records)} events')
+
+        game.restore(state)
+        game.log.clear()
+        game.log.log(f'<b>Resumed game: {state.title}</b>\n')
+        self.replaying = True
+        try:
+            for position, timestamp, event in records:
+                self.replay(game, event)
+        finally:
+            self.replaying = False
+
+        # Drop any partial record and snapshot the restored state
+        self.close()
+        self.file = open(self.journal_path, 'ab', buffering=0)
+        self.file.truncate(end)
+        self.file.seek(end)  # tell() is the snapshot offset
+        self.snapshot()
+
+    @staticmethod
+    def replay(game, event):
+        if event.kind == 'epidemic':
+            game.epidemic(event.card.name)
+        elif event.kind == 'undo':
+            game.undo()
+        elif event.kind == 'redo':
+            game.redo()
+        elif event.kind == 'batch':
+            game.apply([Move(move.card, move.source, move.target,
+                             move.position) for move in event.events])
+        else:
+            game.draw_card(game.deck[event.source], game.deck[event.target],
+                           event.card, position=event.position)
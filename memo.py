@@ -0,0 +1,60 @@
+"""
+Shared memo of results derived from deck states.
+
+Results are keyed on the fingerprints of the Decks they were computed
+from, so they are found again whenever the same state comes back:
+after a move and its reverse, after an undo, or in another Game that
+reaches the same cards. The memo is bounded and drops the least
+recently used results first.
+
+    matrix = memo.get(('positions', draw.fingerprint),
+                      lambda: PositionMatrix(draw))
+
+Memoized results are shared, so they must not be changed.
+"""
+
+from collections import OrderedDict
+import threading
+
+MEMO_SIZE = 4096            # Results kept
+
+
+class Memo:
+    """Bounded least recently used cache of computed results.
+    It can be shared by threads: results are computed outside the lock,
+    so two threads may compute the same result at the same time."""
+
+    def __init__(self, size=MEMO_SIZE):
+        self.size = size
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """Return the result for a key, calling compute() to get it
+        if it isn't in the memo."""
+        with self.lock:
+            if key in self.results:
+                self.hits += 1
+                self.results.move_to_end(key)
+                return self.results[key]
+            self.misses += 1
+        result = compute()
+        with self.lock:
+            self.results[key] = result
+            if len(self.results) > self.size:
+                self.results.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.results)
+
+
+# Shared by every Game in the process
+memo = Memo()
@@ -0,0 +1,160 @@
+"""
+Latency metrics for the callbacks and hot paths of the tracker.
+
+Methods are instrumented by replacing them on their class with a
+wrapper that times each call into a Histogram. Instrumented methods
+only check a flag while metrics are off, and nothing is instrumented
+unless a program asks for it:
+
+    metrics.instrument(Game, 'draw_card', 'epidemic')
+    metrics.instrument(App, 'cb_*', 'update_*')
+    metrics.enable()
+    ...
+    print(metrics.format())
+
+Setting the EPIDEMIC_METRICS environment variable enables metrics
+when the GUI or the command line interface starts.
+"""
+
+from fnmatch import fnmatch
+import functools
+import json
+import math
+import os
+import time
+
+
+ENV_VAR = 'EPIDEMIC_METRICS'
+BUCKETS = 8                 # Histogram buckets per doubling of latency
+PERCENTILES = (50, 95, 99)
+
+
+class Histogram:
+    """Call count and latency histogram of an operation.
+    Latencies fall in logarithmic buckets, so percentiles
+    are accurate to within a bucket width (about 9%)."""
+
+    def __init__(self):
+        self.buckets = {}   # Bucket index -> number of calls
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        index = int(math.log2(seconds * 1e9 + 1) * BUCKETS)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        """Return the latency in seconds below which
+        percent of the calls fall."""
+        rank = percent / 100 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                upper = (2 ** ((index + 1) / BUCKETS) - 1) / 1e9
+                return min(upper, self.max)
+        return self.max
+
+    def summary(self):
+        """Return the call count and the latencies in milliseconds."""
+        result = {'count': self.count,
+                  'mean_ms': self.total / self.count * 1e3 if self.count
+                  else 0.0}
+        for percent in PERCENTILES:
+            result[f'p{percent}_ms'] = self.percentile(percent) * 1e3
+        result['max_ms'] = self.max * 1e3
+        return result
+
+
+class Metrics:
+    """Histograms of the instrumented operations, by name."""
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+
+    def instrument(self, cls, *patterns):
+        """Time the methods of a class whose names match
+        the fnmatch patterns. Methods are only wrapped once."""
+        for attr, value in list(vars(cls).items()):
+            if not any(fnmatch(attr, pattern) for pattern in patterns):
+                continue
+            wrap = type(value) if isinstance(
+                value, (staticmethod, classmethod)) else None
+            function = value.__func__ if wrap else value
+            if not callable(function) or hasattr(function, 'histogram'):
+                continue
+            wrapper = self.timed(f'{cls.__name__}.{attr}', function)
+            setattr(cls, attr, wrap(wrapper) if wrap else wrapper)
+
+    def timed(self, name, function):
+        """Return a wrapper of function which records its latency."""
+        histogram = self.histograms.setdefault(name, Histogram())
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.add(time.perf_counter() - start)
+
+        wrapper.histogram = histogram
+        return wrapper
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        return self.enabled
+
+    def reset(self):
+        for name in self.histograms:
+            self.histograms[name].__init__()
+
+    def report(self):
+        """Return the summary of every operation that was called,
+        slowest 99th percentile first."""
+        report = {name: histogram.summary()
+                  for name, histogram in self.histograms.items()
+                  if histogram.count}
+        return dict(sorted(report.items(),
+                           key=lambda item: -item[1]['p99_ms']))
+
+    def format(self):
+        """Return the report as a text table."""
+        lines = [f'{"operation":<32} {"calls":>7} {"p50 ms":>8} '
+                 f'{"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}']
+        for name, row in self.report().items():
+            lines.append(f'{name:<32} {row["count"]:>7} '
+                         f'{row["p50_ms"]:>8.3f} {row["p95_ms"]:>8.3f} '
+                         f'{row["p99_ms"]:>8.3f} {row["max_ms"]:>8.3f}')
+        return '\n'.join(lines)
+
+    def export(self, path):
+        """Write the report to a JSON file."""
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+# Instrumented methods are shared by all their instances,
+# so there is a single set of metrics for the program.
+metrics = Metrics()
+
+
+def from_environment():
+    """Enable the metrics if the environment variable is set.
+    Returns True if they were enabled."""
+    if os.environ.get(ENV_VAR, '') not in ('', '0'):
+        metrics.enable()
+    return metrics.enabled
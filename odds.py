@@ -0,0 +1,113 @@
+"""
+Draw probabilities for the Draw Deck, computed with NumPy.
+
+Each segment of the Draw Deck is a card pool that was shuffled
+on its own (the starter deck or an epidemic pile), so every draw
+in a segment is equally likely to be any card of its pool,
+independently of the other segments.
+"""
+
+from fractions import Fraction
+from functools import lru_cache
+from math import comb
+
+import numpy as np
+
+from decks import Card
+from memo import memo
+
+
+class PositionMatrix:
+    """Probability of each card being drawn at each position
+    of a DrawDeck. Rows are draw positions counted from 0 at the top,
+    columns are the unique cards of the deck sorted by name."""
+
+    def __init__(self, deck, positions=None):
+        segments = list(reversed(deck.segments))  # Top segment first
+        self.cards = sorted({card for pool, count in segments
+                             for card in pool.unique()},
+                            key=lambda x: x.name)
+        self.column = {card: i for i, card in enumerate(self.cards)}
+
+        # Card counts of every pool, one row per segment
+        counts = np.zeros((len(segments), len(Card.registry)))
+        for row, (pool, count) in enumerate(segments):
+            counts[row, :len(pool.counts)] = pool.counts
+        counts = counts[:, [card.id for card in self.cards]]
+        sizes = counts.sum(axis=1, keepdims=True)
+        odds = np.divide(counts, sizes, out=counts, where=sizes > 0)
+
+        # Repeat each segment row once per draw it covers
+        draws = np.array([count for pool, count in segments], dtype=int)
+        if positions is not None:
+            draws = np.diff(np.minimum(np.cumsum(draws), positions),
+                            prepend=0)
+        self.matrix = np.repeat(odds, draws, axis=0)
+
+    def row(self, position):
+        """Return (card, probability) pairs for the possible cards
+        at a draw position, sorted by card name."""
+        probabilities = self.matrix[position]
+        return [(self.cards[i], float(probabilities[i]))
+                for i in np.flatnonzero(probabilities)]
+
+    def probability(self, card, position):
+        """Return the probability of a card at a draw position."""
+        if card not in self.column:
+            return 0.0
+        return float(self.matrix[position, self.column[card]])
+
+    def __len__(self):
+        return len(self.matrix)
+
+
+@lru_cache(maxsize=4096)
+def miss_chance(size, hits, draws):
+    """Return the exact probability, as a Fraction, of drawing none
+    of the hits cards when drawing from a pool of size cards."""
+    return Fraction(comb(size - hits, draws), comb(size, draws))
+
+
+class Forecast:
+    """Exact probability of cards being drawn within the next draws
+    of a DrawDeck. Draws use up the top segment before moving on
+    to the next one, and each segment is drawn without replacement,
+    so the chance of missing the cards is a product of hypergeometric
+    terms. Results are memoized on the fingerprint of the deck."""
+
+    def __init__(self, deck):
+        self.deck = deck
+
+    def city(self, card, draws):
+        """Chance that a card is drawn within the next draws."""
+        return self.cities([card], draws)
+
+    def cities(self, cards, draws):
+        """Chance that any of the cards is drawn within the next draws."""
+        cards = frozenset(cards)
+        return self._cached(
+            ('cities', cards, draws),
+            lambda pool: sum(pool.count(card) for card in cards), draws)
+
+    def color(self, color, draws):
+        """Chance that any card of a color is drawn within the next draws."""
+        if color not in Card.valid_colors:
+            raise ValueError(f'Card color "{color}" invalid')
+        return self._cached(
+            ('color', color, draws),
+            lambda pool: sum(count for card, count in pool.items()
+                             if card.color == color), draws)
+
+    def _cached(self, key, hits, draws):
+        return memo.get(('forecast', self.deck.fingerprint) + key,
+                        lambda: self._chance(hits, draws))
+
+    def _chance(self, hits, draws):
+        miss = Fraction(1)
+        for pool, count in reversed(self.deck.segments):
+            if draws <= 0:
+                break
+            drawn = min(draws, count)
+            miss *= miss_chance(len(pool), hits(pool), drawn)
+            draws -= drawn
+        return float(1 - miss)
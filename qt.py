@@ -1,11 +1,17 @@
-from PySide2.QtWidgets import QTextEdit, QWidget, QHBoxLayout, QVBoxLayout,\
-    QLabel, QPushButton, QGroupBox, QRadioButton, QComboBox, QScrollArea,\
-    QButtonGroup, QFrame
-from PySide2.QtCore import Qt, QSize, Signal
+from PySide2.QtWidgets import QPlainTextEdit, QWidget, QHBoxLayout,\
+    QVBoxLayout, QLabel, QPushButton, QGroupBox, QRadioButton, QComboBox,\
+    QListView, QButtonGroup, QFrame, QAbstractItemView, QStyledItemDelegate,\
+    QStyle, QCheckBox, QToolTip
+from PySide2.QtCore import Qt, QSize, Signal, QAbstractListModel, \
+    QModelIndex, QStringListModel, QTimer
+from PySide2.QtGui import QColor, QFont, QCursor
 from enum import Enum
 import bisect
 import logging
 
+from decks import Card
+from memo import memo
+
 
 ###############################################################################
 # Interface constants, sizes and colors
@@ -20,6 +26,8 @@ WIDTH = 150                 # Width of buttons and layout columns
 HEIGHT = 24                 # Height of buttons
 WIDTH_WITH_SCROLL = 176
 TOP_CARDS = 16              # Number of Pool Selector buttons to display
+LOG_LINES = 500             # Lines kept in the log view
+PREVIEW_DRAWS = 3           # Draw positions shown in move previews
 
 COLOR = {
     'blue': '#4073bf',
@@ -67,6 +75,14 @@ class AppButtons(QVBoxLayout):
         self.addWidget(self.button_new_game)
         self.button_help = QPushButton('Help')
         self.addWidget(self.button_help)
+        self.button_log = QPushButton('Full Log')
+        self.addWidget(self.button_log)
+        h_undo = QHBoxLayout()
+        self.button_undo = QPushButton('Undo')
+        h_undo.addWidget(self.button_undo)
+        self.button_redo = QPushButton('Redo')
+        h_undo.addWidget(self.button_redo)
+        self.addLayout(h_undo)
 
 
 class EpidemicMenu(QVBoxLayout):
@@ -74,11 +90,49 @@ class EpidemicMenu(QVBoxLayout):
         super().__init__()
         self.setSpacing(SPACING)
         self.addWidget(Heading('Epidemic'))
+        self.model = QStringListModel()
         self.combo_box = QComboBox()
+        self.combo_box.setModel(self.model)
         self.addWidget(self.combo_box)
         # self.btn_shuffle_epidemic.clicked.connect(self.app.cb_epidemic)
         self.button = QPushButton('Shuffle Epidemic')
         self.addWidget(self.button)
+        self._shown = None  # Fingerprint of the pool in the menu
+        self.highlighted = self.combo_box.highlighted
+
+    def show(self, deck):
+        """List the cards of the bottom pool of the Draw Deck.
+        Nothing is rebuilt unless the pool has changed."""
+        if self._shown == deck.fingerprint:
+            return
+        self._shown = deck.fingerprint
+        names = memo.get(('names', deck.fingerprint), lambda: sorted(
+            card.name for card in deck.unique()))
+        self.set_items(names)
+        self.combo_box.setDisabled(False)
+        self.button.setDisabled(False)
+
+    def show_empty(self):
+        self._shown = None
+        self.set_items(['(Draw Deck Empty)'])
+        self.combo_box.setDisabled(True)
+        self.button.setDisabled(True)
+
+    def set_items(self, names):
+        # Keep the selected card if it is still in the list
+        if names == self.model.stringList():
+            return
+        selected = self.combo_box.currentText()
+        self.model.setStringList(list(names))
+        self.combo_box.setCurrentIndex(
+            names.index(selected) if selected in names else 0)
+
+    def name(self, index):
+        return self.model.stringList()[index]
+
+    def show_preview(self, text):
+        """Show a preview next to the highlighted item of the list."""
+        QToolTip.showText(QCursor.pos(), text, self.combo_box.view())
 
 
 class DestinationRadioBox(QGroupBox):
@@ -102,6 +156,40 @@ class DestinationRadioBox(QGroupBox):
         self.setLayout(box)
 
 
+class Selection(QVBoxLayout):
+    """Multi-select mode: clicked cards are queued
+    and moved together when Apply is clicked."""
+
+    def __init__(self):
+        super().__init__()
+        self.setSpacing(SPACING)
+        self.checkbox = QCheckBox('Select several cards')
+        self.addWidget(self.checkbox)
+        self._text = QLabel()
+        self._text.setTextFormat(Qt.RichText)
+        self._text.setWordWrap(True)
+        self._text.setFixedWidth(WIDTH)
+        self.addWidget(self._text)
+        h_buttons = QHBoxLayout()
+        self.button_apply = QPushButton('Apply')
+        h_buttons.addWidget(self.button_apply)
+        self.button_clear = QPushButton('Clear')
+        h_buttons.addWidget(self.button_clear)
+        self.addLayout(h_buttons)
+        self.show([])
+
+    def is_active(self):
+        return self.checkbox.isChecked()
+
+    def show(self, moves):
+        """List the queued moves."""
+        self._text.setText(''.join(
+            f'{move.card.name} ({move.source} -> {move.target})<br>'
+            for move in moves))
+        self.button_apply.setEnabled(bool(moves))
+        self.button_clear.setEnabled(bool(moves))
+
+
 class Stats(QVBoxLayout):
     def __init__(self):
         super().__init__()
@@ -109,9 +197,13 @@ class Stats(QVBoxLayout):
         self._text = QLabel()
         self._text.setTextFormat(Qt.RichText)
         self.addWidget(self._text)
+        self._chances = QLabel()
+        self._chances.setTextFormat(Qt.RichText)
+        self.addWidget(self._chances)
         self._max_cards = 10
 
     def show(self, stats):
+        self._chances.clear()
         text = f'<p>Total cards in game: {stats.total}</p>'
         text += f'<p>In discard pile: {stats.in_discard}</p>'
         if stats.deck['draw'].is_empty():
@@ -129,6 +221,43 @@ class Stats(QVBoxLayout):
             text += f'<p>({stats.top_freq} of each)</p>'
         self._text.setText(text)
 
+    def render_preview(self, title, stats):
+        """Return the HTML summary of the Stats a move would lead to."""
+        if stats.deck['draw'].is_empty():
+            return f'<b>{title}</b><br>(Draw Deck is empty)'
+        if len(stats.top_cards) < self._max_cards:
+            cards = ', '.join(sorted(card.name for card in stats.top_cards))
+        else:
+            cards = f'{self._max_cards}+ cards'
+        lines = [f'<b>{title}</b>',
+                 f'Top probability: {stats.percentage:.2%}',
+                 f'{cards} ({stats.top_freq} of each)',
+                 f'In discard pile: {stats.in_discard}']
+
+        # Most likely card at each of the next draws
+        positions = stats.next_positions(PREVIEW_DRAWS)
+        colors = set()
+        for position in range(len(positions)):
+            row = positions.row(position)
+            colors.update(card.color for card, chance in row)
+            card, chance = max(row, key=lambda x: x[1])
+            lines.append(f'Draw {position + 1}: {card.name} {chance:.0%} '
+                         f'(of {len(row)} cards)')
+
+        # Chance of each color within the next draws
+        lines.append(f'Next {PREVIEW_DRAWS} draws: ' + ', '.join(
+            f'<span style="color: {COLOR[color]}">{color}</span> '
+            f'{stats.forecast.color(color, PREVIEW_DRAWS):.0%}'
+            for color in Card.valid_colors if color in colors))
+        return '<br>'.join(lines)
+
+    def show_chances(self, chances, draws):
+        """Show the chance of drawing each color within the next draws."""
+        self._chances.setText(''.join(
+            [f'<p><strong>Next {draws} draws:</strong></p>'] +
+            [f'<span style="color: {COLOR[color]}">{color}</span> '
+             f'{chance:.0%}<br>' for color, chance in chances.items()]))
+
 
 ###############################################################################
 # Pool selector & card pool
@@ -153,6 +282,8 @@ class PoolButton(QLabel):
         return self.connected
 
     def set_active(self, active):
+        if active == self.active:
+            return
         self.active = active
         self.setStyleSheet(
             ButtonCSS.Active.value if active else ButtonCSS.Inactive.value)
@@ -172,6 +303,8 @@ class PoolButton(QLabel):
             self.setStyleSheet(ButtonCSS.Inactive.value)
 
     def set_text(self, text):
+        if text == self.text():
+            return
         self.setText(text)
         self.repaint()  # Fix Qt bug on macOS
 
@@ -192,27 +325,51 @@ class PoolSelector(QVBoxLayout):
 
 
 class Log(QFrame):
-    def __init__(self):
+    def __init__(self, max_lines=LOG_LINES):
         super().__init__()
         # QFrame needs an object name so that its stylesheet border
-        # isn't applied to the QTextEdit child widget
+        # isn't applied to the QPlainTextEdit child widget
         self.setObjectName('log-frame')
         style = f'border: 1px solid {COLOR["gray"]}; border-radius: 5px;'
         self.setStyleSheet('QFrame#log-frame {' + style + '}')
         layout = QVBoxLayout()
         self.setLayout(layout)
 
-        # CSS selector set specifically to QTextEdit
+        # CSS selector set specifically to QPlainTextEdit
         # otherwise scrollbar appearance is modified
-        self.edit = QTextEdit()
-        self.edit.setStyleSheet('QTextEdit {background-color: transparent}')
+        self.edit = QPlainTextEdit()
+        self.edit.setStyleSheet(
+            'QPlainTextEdit {background-color: transparent}')
         self.edit.setReadOnly(True)
+        self.edit.setMaximumBlockCount(max_lines)
         layout.addWidget(self.edit)
 
+        # Entries are appended together once per event loop pass
+        self.pending = []
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.flush)
+
     def log(self, text):
-        self.edit.append(text)
+        self.pending.append(text)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        self.timer.stop()
+        # Older entries would be dropped by the maximum block count anyway
+        pending = self.pending[-self.edit.maximumBlockCount():]
+        self.pending = []
+        self.edit.setUpdatesEnabled(False)
+        for text in pending:
+            self.edit.appendHtml(text)
+        self.edit.setUpdatesEnabled(True)
+        scrollbar = self.edit.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
 
     def clear(self):
+        self.pending = []
         self.edit.clear()
 
 
@@ -225,22 +382,47 @@ class Cardpool(QVBoxLayout):
         self._text.setWordWrap(True)
         self._text.setFixedWidth(WIDTH)
         self.addWidget(self._text)
+        self._chances = QLabel()
+        self._chances.setTextFormat(Qt.RichText)
+        self._chances.setWordWrap(True)
+        self._chances.setFixedWidth(WIDTH)
+        self.addWidget(self._chances)
         self.addStretch()
         self._max_cards = 35
 
     def show_empty(self):
         self._text.setText(f'<p>Draw Deck is empty.</p>')
+        self._chances.clear()
 
     def show(self, deck_name, position, deck):
-        text = f'<p>Card position: {position}</p>'
-        text += f'<p>(from {deck_name})<p>'
-        text += f'<p><strong>Possible cards:</strong></p>'
-        if len(deck) < self._max_cards:
-            for card in sorted(set(deck.cards), key=lambda x: x.name):
-                text += f'{card.name} ({deck.cards.count(card)})<br>'
+        self._chances.clear()
+        # The card list is rendered once for every pool content
+        cards = memo.get(('cardpool', deck.fingerprint),
+                         lambda: self.render(deck))
+        self._text.setText(''.join([
+            f'<p>Card position: {position}</p>',
+            f'<p>(from {deck_name})<p>',
+            f'<p><strong>Possible cards:</strong></p>',
+            cards]))
+
+    def render(self, deck):
+        """Return the HTML list of the cards of a pool,
+        with their count and probability of being drawn."""
+        if len(deck) >= self._max_cards:
+            return f'{self._max_cards}+ cards'
+        return ''.join(
+            f'{card.name} ({count}, {count / len(deck):.0%})<br>'
+            for card, count in sorted(deck.items(), key=lambda x: x[0].name))
+
+    def show_chances(self, chances):
+        """Show the chance of each card being drawn by this position."""
+        if len(chances) >= self._max_cards:
+            lines = [f'{self._max_cards}+ cards']
         else:
-            text += f'{self._max_cards}+ cards'
-        self._text.setText(text)
+            lines = [f'{name} {chance:.0%}<br>'
+                     for name, chance in chances.items()]
+        self._chances.setText(''.join(
+            ['<p><strong>Drawn by then:</strong></p>'] + lines))
 
 
 ###############################################################################
@@ -248,96 +430,164 @@ class Cardpool(QVBoxLayout):
 ###############################################################################
 
 
-class CardButton(QLabel):
-    clicked = Signal()
+class CardListModel(QAbstractListModel):
+    """List model of the Card objects shown in a deck column.
+    Changes are made row by row, so the view only updates
+    the rows that were inserted or removed."""
 
-    def __init__(self, card):
-        super().__init__(card.name)
-        self.card = card
-        self.color = None
-        self.stylesheet = None
-        self.setAlignment(Qt.AlignCenter)
-        self.setFixedSize(QSize(WIDTH, HEIGHT))
+    def __init__(self):
+        super().__init__()
+        self.cards = []
 
-    def set_color(self, color):
-        self.color = color
-        self.stylesheet = f'background: {self.color};' \
-                          f'color: white;' \
-                          f'font-weight: bold;'
-        self.setStyleSheet(self.stylesheet)
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.cards)
 
-    def mouseReleaseEvent(self, event):
-        self.clicked.emit()
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        card = self.cards[index.row()]
+        if role == Qt.DisplayRole:
+            return card.name
+        if role == Qt.UserRole:
+            return card
+        return None
+
+    def card(self, row):
+        return self.cards[row]
+
+    def insert(self, row, card):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.cards.insert(row, card)
+        self.endInsertRows()
+
+    def remove(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.cards[row]
+        self.endRemoveRows()
 
-    def enterEvent(self, event):
-        self.setStyleSheet(ButtonCSS.MouseEnter.value)
+    def clear(self):
+        self.beginResetModel()
+        self.cards.clear()
+        self.endResetModel()
 
-    def leaveEvent(self, event):
-        self.setStyleSheet(self.stylesheet)
+
+class CardDelegate(QStyledItemDelegate):
+    """Paints the rows of a deck column as colored card buttons."""
+
+    def __init__(self, use_color=True):
+        super().__init__()
+        self.use_color = use_color
+        self.font = QFont()
+        self.font.setBold(True)
+
+    def sizeHint(self, option, index):
+        return QSize(WIDTH, HEIGHT + SPACING)
+
+    def paint(self, painter, option, index):
+        card = index.data(Qt.UserRole)
+        rect = option.rect.adjusted(0, 0, 0, -SPACING)
+        if option.state & QStyle.State_MouseOver:
+            background, text = 'black', 'white'
+        elif self.use_color:
+            background, text = COLOR[card.color], 'white'
+        else:
+            background, text = COLOR['gray'], 'white'
+
+        painter.save()
+        painter.fillRect(rect, QColor(background))
+        painter.setPen(QColor(text))
+        painter.setFont(self.font)
+        painter.drawText(rect, Qt.AlignCenter, card.name)
+        painter.restore()
 
 
 class Deck(QVBoxLayout):
+    card_clicked = Signal(object)
+    card_entered = Signal(object)   # Mouse over a card
+
     def __init__(self, heading, color=True):
         super().__init__()
         logging.info(f'[Deck] {heading} init')
         self.addWidget(Heading(heading))
-        self.use_color = color
-        self.cards = []
-        self.buttons = []
         self.heading = heading
 
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.addWidget(self.scroll_area)
-
-        self.v_scroll = QVBoxLayout()
-        self.v_scroll.setSpacing(SPACING)
-        self.v_scroll.addStretch()
-
-        self.scroll_widget = QWidget()
-        self.scroll_widget.setLayout(self.v_scroll)
-        self.scroll_area.setFixedWidth(WIDTH_WITH_SCROLL)
-        self.scroll_area.setWidget(self.scroll_widget)
-
-    def add_card_button(self, card):
-        return self.insert_button_at_index(card, 0)
-
-    def insert_button_at_index(self, card, index):
-        button = CardButton(card)
-        self.v_scroll.insertWidget(index, button)
-        color = COLOR[card.color] if self.use_color else COLOR['gray']
-        button.set_color(color)
-        self.cards.insert(index, card.name)
-        self.buttons.append(button)
-        return button
-
-    def remove_card_button(self, button):
-        self.cards.remove(button.card.name)
-        self.buttons.remove(button)
-        self.removeWidget(button)
-        button.deleteLater()
+        self.model = CardListModel()
+        self.delegate = CardDelegate(color)
+
+        self.list = QListView()
+        self.list.setModel(self.model)
+        self.list.setItemDelegate(self.delegate)
+        self.list.setMouseTracking(True)
+        self.list.viewport().setAttribute(Qt.WA_Hover)
+        self.list.setSelectionMode(QAbstractItemView.NoSelection)
+        self.list.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.list.setFocusPolicy(Qt.NoFocus)
+        self.list.setUniformItemSizes(True)
+        self.list.setFixedWidth(WIDTH_WITH_SCROLL)
+        self.list.clicked.connect(
+            lambda index: self.card_clicked.emit(self.model.card(index.row())))
+        self.list.entered.connect(
+            lambda index: self.card_entered.emit(self.model.card(index.row())))
+        self.addWidget(self.list)
+
+    @property
+    def cards(self):
+        return self.model.cards
+
+    def show_preview(self, text):
+        """Show a preview next to the card under the mouse."""
+        QToolTip.showText(QCursor.pos(), text, self.list)
+
+    def add_card(self, card):
+        self.model.insert(0, card)
+
+    def remove_card(self, card):
+        self.model.remove(self.model.cards.index(card))
 
     def clear(self):
-        logging.info(f'[Deck] clear {self.heading}')
-        for button in self.buttons:
-            button.deleteLater()
-        self.cards.clear()
-        self.buttons.clear()
+        logging.info('[Deck] clear %s', self.heading)
+        self.model.clear()
 
 
 class DrawDeck(Deck):
     def __init__(self, heading):
         super().__init__(heading)
+        self.names = []  # Sorted card names, for bisect
 
-    def add_card_button(self, card):
+    def add_card(self, card):
         # Override base method, use bisect to insert
         # the card into the Draw Deck in sorted order
-        if card.name not in self.cards:
-            index = bisect.bisect_left(self.cards, card.name)
-            return super().insert_button_at_index(card, index)
-        else:
+        index = bisect.bisect_left(self.names, card.name)
+        if index < len(self.names) and self.names[index] == card.name:
             print(f'[qt DrawCardDeck] {card.name} already in layout')
-            return None
+        else:
+            self.names.insert(index, card.name)
+            self.model.insert(index, card)
+
+    def remove_card(self, card):
+        index = bisect.bisect_left(self.names, card.name)
+        if index == len(self.names) or self.names[index] != card.name:
+            logging.warning('[DrawDeck] %s is not shown', card.name)
+            return
+        del self.names[index]
+        self.model.remove(index)
+
+    def update_cards(self, cards):
+        """Show the given cards, only inserting and removing
+        the rows that differ from the cards already shown."""
+        new = {card.name for card in cards}
+        for card in [card for card in self.model.cards
+                     if card.name not in new]:
+            self.remove_card(card)
+        for card in cards:
+            index = bisect.bisect_left(self.names, card.name)
+            if index == len(self.names) or self.names[index] != card.name:
+                self.names.insert(index, card.name)
+                self.model.insert(index, card)
+
+    def clear(self):
+        super().clear()
+        self.names.clear()
 
 
 ###############################################################################
@@ -374,6 +624,7 @@ class MainWindow(QWidget):
             'exclude_deck': QRadioButton('Exclude')
         }
         self.destinations = DestinationRadioBox(self.destination)
+        self.selection = Selection()
         self.epidemic_menu = EpidemicMenu()
         self.stats = Stats()
 
@@ -413,6 +664,7 @@ class MainWindow(QWidget):
         v_sidebar.addWidget(Heading(' '))
         v_sidebar.addLayout(self.app_buttons)
         v_sidebar.addWidget(self.destinations)
+        v_sidebar.addLayout(self.selection)
         v_sidebar.addLayout(self.epidemic_menu)
         v_sidebar.addLayout(self.stats)
         v_sidebar.addStretch()
@@ -1,14 +1,15 @@
 from PySide2.QtWidgets import QHBoxLayout, QVBoxLayout, QLabel,\
-    QPushButton, QComboBox, QDialog
+    QPushButton, QComboBox, QDialog, QPlainTextEdit
 from PySide2.QtCore import QSize
 # import PySide2.QtCore.Qt.Sheet
 
 
 class DialogNewGame(QDialog):
-    def __init__(self, games):
+    def __init__(self, games, resume=False):
         super().__init__()
+        self.resume = False
         self.setWindowTitle('Start New Game')
-        self.setFixedSize(QSize(250, 150))
+        self.setFixedSize(QSize(250, 180 if resume else 150))
         v_main = QVBoxLayout()
         v_main.addWidget(QLabel('Select the game you wish to track:'))
 
@@ -28,12 +29,23 @@ class DialogNewGame(QDialog):
         h_buttons.addWidget(b_start)
 
         v_main.addLayout(h_buttons)
+
+        # Offer to resume the game saved in the journal
+        if resume:
+            b_resume = QPushButton('Resume Last Game')
+            b_resume.clicked.connect(self.resume_game)
+            v_main.addWidget(b_resume)
+
         self.setLayout(v_main)
 
     def start(self):
         self.accept()
         return self.combo.currentText()
 
+    def resume_game(self):
+        self.resume = True
+        self.accept()
+
     def cancel(self):
         self.reject()
 
@@ -61,3 +73,22 @@ class DialogHelp(QDialog):
 
         v_main.addLayout(h_buttons)
         self.setLayout(v_main)
+
+
+class DialogLog(QDialog):
+    def __init__(self, lines):
+        super().__init__()
+        self.setWindowTitle('Full Game Log')
+        self.resize(QSize(450, 500))
+
+        v_main = QVBoxLayout()
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setPlainText('\n'.join(lines))
+        v_main.addWidget(self.text)
+
+        b_close = QPushButton('Close')
+        b_close.clicked.connect(self.accept)
+        b_close.setDefault(True)
+        v_main.addWidget(b_close)
+        self.setLayout(v_main)
@@ -0,0 +1,459 @@
+#!/usr/bin/env python
+
+"""
+Local tracking service hosting many Game sessions in one process.
+
+Every session is an independent Engine, and all of them share one
+card Catalog. Sessions are driven over a small HTTP/JSON API:
+
+    GET    /games                            Game titles
+    POST   /sessions             {"title"}   Start a game, returns its id
+    GET    /sessions/ID                      Stats of the game
+    DELETE /sessions/ID                      End a game
+    POST   /sessions/ID/draw     {"card", "from", "to"}
+                                             Move a card, by default an
+                                             infection (draw -> discard)
+    POST   /sessions/ID/epidemic {"card"}    Shuffle an epidemic
+    POST   /sessions/ID/undo                 Undo the last action
+    POST   /sessions/ID/redo                 Redo the last undone action
+    GET    /sessions/ID/stats                Stats of the game
+    GET    /sessions/ID/probabilities?position=1
+                                             Cards at a draw position
+    GET    /sessions/ID/probabilities?draws=3&city=Lagos&city=Paris
+    GET    /sessions/ID/probabilities?draws=3&color=black
+                                             Chance of drawing the cards
+
+The service runs on a single asyncio event loop. Requests are handled
+one at a time between socket reads, which is enough for thousands of
+sessions because every action only touches the decks of one game.
+Only the most recently used sessions are kept in memory: the others
+are pickled to disk and loaded again on their next request. Sessions
+are pickled and unpickled in threads, off the event loop.
+
+    python service.py --port 8765
+"""
+
+import argparse
+import asyncio
+from collections import Counter, OrderedDict
+from http import HTTPStatus
+import json
+import os
+import pickle
+import re
+import secrets
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from engine import Engine
+from game import Game
+import utility
+
+import logging
+logger = logging.getLogger(__name__)
+
+CAPACITY = 1000             # Sessions kept in memory
+IDLE_TIMEOUT = 600          # Seconds before an idle session is evicted
+MAX_BODY = 65536            # Largest request body, in bytes
+SESSION_FILE = '{}.session'
+SESSION_ID = re.compile(r'[0-9a-f]{16}')
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Sessions:
+    """Game sessions by id. The least recently used sessions
+    over capacity are evicted to files in a directory."""
+
+    def __init__(self, games, path, capacity=CAPACITY):
+        self.games = games
+        self.path = path
+        self.capacity = capacity
+        self.live = OrderedDict()  # Id -> Engine, least recently used first
+        self.last_used = {}        # Id -> time.monotonic() of last use
+
+    def create(self, title):
+        engine = Engine(Game(self.games))
+        engine.new_game(title)
+        session = secrets.token_hex(8)
+        self.add(session, engine)
+        self.trim()
+        return session
+
+    def add(self, session, engine):
+        """Keep a loaded session in memory, as the most recently used."""
+        self.live.setdefault(session, engine)
+        self.live.move_to_end(session)
+        self.last_used[session] = time.monotonic()
+
+    def get(self, session):
+        """Return the Engine of a session, loading it if it was evicted."""
+        if session not in self.live:
+            self.add(session, self.load(session))
+            self.trim()
+        return self.use(session)
+
+    def use(self, session):
+        """Return the Engine of a session in memory, without loading it."""
+        engine = self.live[session]
+        self.live.move_to_end(session)
+        self.last_used[session] = time.monotonic()
+        return engine
+
+    def delete(self, session):
+        """End a session, in memory or evicted."""
+        path = self.file(session)
+        found = self.live.pop(session, None) is not None
+        self.last_used.pop(session, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            if not found:
+                raise KeyError(session)
+
+    def file(self, session):
+        if not SESSION_ID.fullmatch(session):
+            raise KeyError(session)
+        return os.path.join(self.path, SESSION_FILE.format(session))
+
+    def load(self, session):
+        try:
+            with open(self.file(session), 'rb') as f:
+                state, history, log = pickle.loads(f.read())
+        except FileNotFoundError:
+            raise KeyError(session)
+        engine = Engine(Game(self.games))
+        engine.game.restore(state)
+        engine.game.history = history
+        engine.game.log.entries.extend(log)
+        engine.title = state.title
+        return engine
+
+    def take(self, session):
+        """Drop a session from memory and return its Game."""
+        del self.last_used[session]
+        return self.live.pop(session).game
+
+    def save(self, session, game):
+        # Only touches the files of the session, so it can run in a thread
+        data = pickle.dumps((game.snapshot(), game.history, list(game.log)),
+                            pickle.HIGHEST_PROTOCOL)
+        temp = f'{self.file(session)}.tmp'
+        with open(temp, 'wb') as f:
+            f.write(data)
+        os.replace(temp, self.file(session))
+
+    def evict(self, session):
+        """Write a session to disk and drop it from memory."""
+        self.save(session, self.take(session))
+
+    def over_capacity(self, room=0, keep=()):
+        """Return the least recently used session not in keep if there
+        are more than capacity - room sessions in memory, else None."""
+        if len(self.live) > self.capacity - room:
+            return next((session for session in self.live
+                         if session not in keep), None)
+        return None
+
+    def idle(self, timeout):
+        """Return the least recently used session if it was unused
+        for timeout seconds, else None."""
+        session = next(iter(self.live), None)
+        if session is not None and \
+                time.monotonic() - self.last_used[session] >= timeout:
+            return session
+        return None
+
+    def trim(self):
+        while self.over_capacity() is not None:
+            self.evict(self.over_capacity())
+
+    def evict_idle(self, timeout):
+        """Evict the sessions unused for timeout seconds."""
+        while self.idle(timeout) is not None:
+            self.evict(self.idle(timeout))
+
+    def close(self):
+        for session in list(self.live):
+            self.evict(session)
+
+
+class Service:
+    """HTTP/JSON front end of the Sessions."""
+
+    def __init__(self, sessions, idle_timeout=IDLE_TIMEOUT):
+        self.sessions = sessions
+        self.idle_timeout = idle_timeout
+        self.saving = {}    # Session -> future of its save to disk
+        self.loading = {}   # Session -> future of its load from disk
+        self.wanted = Counter()     # Sessions being loaded for a request
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        server = await asyncio.start_server(self.handle, host, port)
+        logger.info(f'Serving on {host}:{port}')
+        sweeper = asyncio.ensure_future(self.sweep())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sweeper.cancel()
+            self.sessions.close()
+
+    async def sweep(self):
+        while True:
+            await asyncio.sleep(self.idle_timeout / 4)
+            session = self.sessions.idle(self.idle_timeout)
+            while session is not None:
+                await self.evict(session)
+                session = self.sessions.idle(self.idle_timeout)
+
+    @staticmethod
+    async def run(function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, function, *args)
+
+    async def evict(self, session):
+        """Evict a session, saving it in a thread."""
+        game = self.sessions.take(session)
+        self.saving[session] = asyncio.ensure_future(self.save(session, game))
+        await asyncio.shield(self.saving[session])
+
+    async def save(self, session, game):
+        # Runs as a task, done only once it is out of self.saving
+        try:
+            await self.run(self.sessions.save, session, game)
+        finally:
+            del self.saving[session]
+
+    async def read(self, session):
+        # Runs as a task, done only once it is out of self.loading
+        try:
+            engine = await self.run(self.sessions.load, session)
+            self.sessions.add(session, engine)
+        finally:
+            del self.loading[session]
+
+    async def saved(self, session):
+        """Wait until a session is not being saved or loaded."""
+        while session in self.saving or session in self.loading:
+            await asyncio.shield(self.saving.get(session) or
+                                 self.loading[session])
+
+    async def trim(self, room=0):
+        """Evict sessions until there is room for more."""
+        session = self.sessions.over_capacity(room, self.wanted)
+        while session is not None:
+            await self.evict(session)
+            session = self.sessions.over_capacity(room, self.wanted)
+
+    async def load(self, session):
+        """Load an evicted session in a thread. It is in memory on
+        return: the sessions wanted by requests are not evicted, so
+        memory may briefly hold more than capacity sessions."""
+        self.wanted[session] += 1
+        try:
+            while session not in self.sessions.live:
+                if session in self.saving or session in self.loading:
+                    await self.saved(session)
+                elif self.sessions.over_capacity(1, self.wanted) is not None:
+                    await self.trim(room=1)
+                else:
+                    self.loading[session] = asyncio.ensure_future(
+                        self.read(session))
+        finally:
+            self.wanted[session] -= 1
+            if not self.wanted[session]:
+                del self.wanted[session]
+
+    async def prepare(self, method, target):
+        # Do the disk I/O of a request before dispatching it,
+        # so that the Sessions never block the event loop
+        path = [part for part in urlsplit(target).path.split('/') if part]
+        if path[:1] != ['sessions']:
+            return
+        try:
+            if len(path) == 1 and method == 'POST':
+                await self.trim(room=1)
+            elif len(path) in (2, 3) and method == 'DELETE':
+                await self.saved(path[1])
+            elif len(path) in (2, 3):
+                await self.load(path[1])
+        except KeyError:
+            pass  # Unknown sessions are reported by dispatch()
+
+    async def handle(self, reader, writer):
+        """Serve the requests of a connection, keeping it alive
+        unless the client asks to close it."""
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HTTPError as e:
+                    await self.respond(writer, HTTPStatus(e.status),
+                                       {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                await self.prepare(method, target)
+                status, payload = self.dispatch(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive=True):
+        data = json.dumps(payload).encode()
+        writer.write(
+            f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(data)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}'
+            f'\r\n\r\n'.encode() + data)
+        await writer.drain()
+
+    @staticmethod
+    async def read_request(reader):
+        # Return (method, target, headers, body) or None at the end.
+        # Raises HTTPError for a body that can't be read.
+        line = await reader.readline()
+        words = line.decode('latin-1').split()
+        if len(words) != 3:
+            return None
+        method, target, version = words
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Invalid Content-Length')
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Invalid Content-Length')
+        if length > MAX_BODY:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                            f'The request body is over {MAX_BODY} bytes')
+        body = await reader.readexactly(length) if length else b''
+        return method, target, headers, body
+
+    def dispatch(self, method, target, body=b''):
+        """Handle a request. Returns an HTTPStatus and a JSON payload."""
+        url = urlsplit(target)
+        path = [part for part in url.path.split('/') if part]
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise ValueError('The request body must be a JSON object')
+            return HTTPStatus.OK, self.route(
+                method, path, parse_qs(url.query), data)
+        except HTTPError as e:
+            return HTTPStatus(e.status), {'error': str(e)}
+        except KeyError as e:
+            return HTTPStatus.NOT_FOUND, {'error': f'No session {e}'}
+        except (ValueError, IndexError) as e:
+            return HTTPStatus.BAD_REQUEST, {'error': str(e)}
+
+    def route(self, method, path, query, data):
+        if path == ['games'] and method == 'GET':
+            return {'games': list(self.sessions.games)}
+        if path == ['sessions'] and method == 'POST':
+            session = self.sessions.create(self.field(data, 'title'))
+            return {'session': session}
+        if len(path) not in (2, 3) or path[0] != 'sessions':
+            raise HTTPError(HTTPStatus.NOT_FOUND, 'Not found')
+
+        action = path[2] if len(path) == 3 else None
+        if (method, action) == ('DELETE', None):
+            self.sessions.delete(path[1])
+            return {}
+        # prepare() has loaded the session: a session missing from
+        # memory here is unknown, never read on the event loop
+        engine = self.sessions.use(path[1])
+        if method == 'GET' and action in (None, 'stats'):
+            return self.stats(engine)
+        if method == 'GET' and action == 'probabilities':
+            return self.probabilities(engine, query)
+        if method != 'POST':
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED,
+                            f'{method} is not allowed here')
+        if action == 'draw':
+            engine.move(self.field(data, 'card'), data.get('from', 'draw'),
+                        data.get('to', 'discard'))
+        elif action == 'epidemic':
+            engine.epidemic(self.field(data, 'card'))
+        elif action == 'undo':
+            engine.undo()
+        elif action == 'redo':
+            engine.redo()
+        else:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f'Unknown action {action}')
+        return self.stats(engine)
+
+    @staticmethod
+    def field(data, name):
+        if not isinstance(data.get(name), str):
+            raise ValueError(f'Missing "{name}"')
+        return data[name]
+
+    @staticmethod
+    def stats(engine):
+        stats = engine.stats()
+        stats['title'] = engine.game.title
+        stats['epidemics'] = engine.game.epidemic_count
+        return stats
+
+    @staticmethod
+    def probabilities(engine, query):
+        if 'draws' in query:
+            draws = int(query['draws'][0])
+            if 'color' in query:
+                chance = engine.chance(query['color'][0], draws)
+            elif 'city' in query:
+                chance = engine.chance(query['city'], draws)
+            else:
+                raise ValueError('Probabilities need a city or a color')
+            return {'draws': draws, 'chance': chance}
+
+        position = int(query.get('position', ['1'])[0])
+        if position < 1:
+            raise ValueError('Positions start at 1')
+        return {'position': position,
+                'cards': [{'name': name, 'count': count, 'probability': p}
+                          for name, count, p in engine.pool(position - 1)]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Epidemic tracking service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--capacity', type=int, default=CAPACITY,
+                        help='sessions kept in memory')
+    parser.add_argument('--idle', type=float, default=IDLE_TIMEOUT,
+                        help='seconds before an idle session is evicted')
+    parser.add_argument('--sessions', help='directory of evicted sessions')
+    args = parser.parse_args(argv)
+
+    path = args.sessions or os.path.join(utility.get_data_dir(), 'sessions')
+    os.makedirs(path, exist_ok=True)
+    sessions = Sessions(Game.get_all_games(), path, args.capacity)
+    try:
+        asyncio.run(Service(sessions, args.idle).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Monte Carlo simulation of future infection draws.
+
+The simulation starts from the current state of a Game and plays out
+many random futures: each turn draws a number of infection cards from
+the top of the Draw Deck, and epidemics at the requested turns draw
+the bottom card and shuffle the discard pile back on top, as in
+Game.epidemic.
+
+The decks are converted to arrays of card indices and a whole batch
+of rollouts is played at once, one row per rollout. Batches are spread
+over a process pool, each with its own seed spawned from a single
+SeedSequence, so results only depend on the seed and the batch size.
+"""
+
+import multiprocessing
+import os
+
+import numpy as np
+
+
+BATCH_SIZE = 20000          # Rollouts per worker task
+
+
+class SimulationResult:
+    """Infection counts gathered over all the rollouts.
+    The turns are split into periods at each epidemic: period 0 runs
+    until the next epidemic, period 1 until the one after, and so on.
+    histogram[period, card, n] is the number of rollouts in which
+    the card was infected n times during the period."""
+
+    def __init__(self, cards, periods, histogram):
+        self.cards = cards
+        self.periods = periods
+        self.histogram = histogram
+        self.rollouts = int(histogram[0, 0].sum()) if cards else 0
+        self.column = {card: i for i, card in enumerate(cards)}
+
+    def distribution(self, card, period=0):
+        """Probability of a card being infected 0, 1, 2... times
+        during a period."""
+        if card not in self.column:
+            return np.array([1.0])
+        return self.histogram[period, self.column[card]] / self.rollouts
+
+    def chance(self, card, period=0):
+        """Probability of a card being infected at least once
+        during a period."""
+        return 1 - float(self.distribution(card, period)[0])
+
+    def mean(self, card, period=0):
+        """Average number of times a card is infected during a period."""
+        distribution = self.distribution(card, period)
+        return float(distribution @ np.arange(len(distribution)))
+
+
+def compact(game):
+    """Convert the Draw Deck and discard pile of a Game into arrays
+    of card indices. Returns the list of cards, the Draw Deck segments
+    from the top down and the discard pile."""
+    draw = game.deck['draw']
+    discard = game.deck['discard']
+    pools = [pool for pool, count in reversed(draw.segments)]
+    cards = sorted({card for deck in pools + [discard]
+                    for card in deck.unique()}, key=lambda x: x.name)
+    column = {card: i for i, card in enumerate(cards)}
+
+    def indices(deck):
+        return np.array([column[card] for card in deck], dtype=np.int32)
+
+    return cards, [indices(pool) for pool in pools], indices(discard)
+
+
+def infection_schedule(turns, rate, epidemics):
+    """Return the number of infection draws for every turn and
+    the (first, last) turns of each period between epidemics."""
+    if isinstance(rate, int):
+        rate = [rate] * turns
+    elif len(rate) != turns:
+        raise ValueError('One infection rate is needed for every turn')
+    if any(not 0 <= turn < turns for turn in epidemics):
+        raise ValueError('Epidemic turns must be within the simulation')
+
+    starts = sorted({0} | set(epidemics))
+    periods = list(zip(starts, starts[1:] + [turns]))
+    return list(rate), periods
+
+
+def shuffle_rows(rng, cards):
+    """Shuffle each row of a 2D array independently."""
+    order = rng.random(cards.shape).argsort(axis=1)
+    return np.take_along_axis(cards, order, axis=1)
+
+
+def run_batch(task):
+    """Play a batch of rollouts and return their infection histogram.
+    This runs in the worker processes."""
+    n_cards, segments, discard, rate, epidemics, periods, rollouts, seed = task
+    rng = np.random.default_rng(seed)
+    most = max(sum(rate[first:last]) for first, last in periods)
+    histogram = np.zeros((len(periods), n_cards, most + 1), dtype=np.int64)
+
+    # Each row is one rollout, with the top of the Draw Deck in column 0
+    draw = np.hstack(
+        [shuffle_rows(rng, np.tile(pool, (rollouts, 1))) for pool in segments]
+        + [np.empty((rollouts, 0), dtype=np.int32)])
+    discard = np.tile(discard, (rollouts, 1))
+    rows = np.arange(rollouts)[:, None] * n_cards
+    period = 0
+    infected = np.zeros((rollouts, n_cards), dtype=np.int64)
+
+    for turn in range(len(rate)):
+        if turn in epidemics:
+            # Close the current period
+            if turn:
+                histogram[period] += period_histogram(infected, most)
+                infected[:] = 0
+                period += 1
+
+            # Draw the bottom card and shuffle the discard pile on top
+            if draw.shape[1]:
+                discard = np.hstack([discard, draw[:, -1:]])
+                draw = draw[:, :-1]
+            draw = np.hstack([shuffle_rows(rng, discard), draw])
+            discard = discard[:, :0]
+
+        drawn = draw[:, :rate[turn]]
+        draw = draw[:, rate[turn]:]
+        discard = np.hstack([discard, drawn])
+        infected += np.bincount(
+            (rows + drawn).ravel(),
+            minlength=rollouts * n_cards).reshape(rollouts, n_cards)
+
+    histogram[period] += period_histogram(infected, most)
+    return histogram
+
+
+def period_histogram(infected, most):
+    """Count the rollouts in which each card was infected n times."""
+    n_cards = infected.shape[1]
+    offsets = np.arange(n_cards) * (most + 1)
+    return np.bincount((infected + offsets).ravel(),
+                       minlength=n_cards * (most + 1)).reshape(n_cards, -1)
+
+
+def simulate(game, turns, rate=2, epidemics=(), rollouts=100000,
+             seed=None, processes=None, batch_size=BATCH_SIZE):
+    """Simulate the next turns of a Game.
+
+    rate is the number of infection draws per turn, either a single
+    number or one number per turn. epidemics lists the turns, counted
+    from 0, which start with an epidemic. Rollouts are split into
+    batches and run on a pool of processes (all cores by default)."""
+    rate, periods = infection_schedule(turns, rate, epidemics)
+    cards, segments, discard = compact(game)
+
+    sizes = [batch_size] * (rollouts // batch_size)
+    if rollouts % batch_size:
+        sizes.append(rollouts % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(len(cards), segments, discard, rate, frozenset(epidemics),
+              periods, size, child) for size, child in zip(sizes, seeds)]
+
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(run_batch, tasks)
+    else:
+        results = [run_batch(task) for task in tasks]
+
+    histogram = sum(results) if results else np.zeros(
+        (len(periods), len(cards), 1), dtype=np.int64)
+    return SimulationResult(cards, periods, histogram)
@@ -1,17 +1,66 @@
-from collections import Counter
+from memo import memo
 
 
 class Stats:
     """
     The Stats object calculates and returns statistical information
     about Deck objects.
+
+    It subscribes to the Draw Deck and keeps a histogram of the card
+    counts in the top card pool, updated on every change, so reading
+    the stats after a draw doesn't recount the pool.
     """
 
-    def __init__(self, deck):
+    def __init__(self, deck, total=None):
         self.deck = deck
 
         # Cards total should only be updated on object creation
-        self.total = len(self.deck['draw'].bottom())
+        if total is None:
+            total = len(self.deck['draw'].bottom())
+        self.total = total
+
+        self._pool = None       # Top card pool of the Draw Deck
+        self._freq = {}         # Card count -> cards with that count
+        self._top_freq = 0
+        self._forecast = None
+        self.deck['draw'].subscribe(self.update)
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the histogram from the current top card pool"""
+        draw = self.deck['draw']
+        self._pool = None if draw.is_empty() else draw.top()
+        self._freq = {}
+        if self._pool is not None:
+            for card, count in self._pool.items():
+                self._freq.setdefault(count, {})[card] = None
+        self._top_freq = max(self._freq, default=0)
+
+    def update(self, deck, card, delta):
+        """Update the histogram after a change to the Draw Deck"""
+        draw = self.deck['draw']
+        top = None if draw.is_empty() else draw.top()
+        if top is not self._pool or card is None:
+            self.refresh()
+        elif deck is top:
+            self._move(card, delta)
+
+    def _move(self, card, delta):
+        # Move the card from its old count bucket to the new one
+        new = self._pool.count(card)
+        old = new - delta
+        if old:
+            bucket = self._freq[old]
+            del bucket[card]
+            if not bucket:
+                del self._freq[old]
+        if new:
+            self._freq.setdefault(new, {})[card] = None
+
+        if new > self._top_freq:
+            self._top_freq = new
+        elif old == self._top_freq and old not in self._freq:
+            self._top_freq = new if new else max(self._freq, default=0)
 
     @property
     def in_discard(self):
@@ -21,21 +70,48 @@ class Stats:
     @property
     def most_common(self):
         """Get the most common cards in the draw deck"""
-        # Use a Counter to sort the cards by the most common ones
-        return Counter(self.deck['draw'].top().cards).most_common()
+        # Sort the unique cards by count, most common first
+        return sorted(self.deck['draw'].top().items(),
+                      key=lambda x: x[1], reverse=True)
+
+    # The odds module imports NumPy, which is slow to load,
+    # so it is only imported once probabilities are needed.
+
+    @property
+    def positions(self):
+        """Get the probability of every card at every draw position"""
+        from odds import PositionMatrix
+        draw = self.deck['draw']
+        return memo.get(('positions', draw.fingerprint),
+                        lambda: PositionMatrix(draw))
+
+    def next_positions(self, count):
+        """Get the probability of every card at the next count
+        draw positions only, which is cheaper on large decks"""
+        from odds import PositionMatrix
+        draw = self.deck['draw']
+        return memo.get(('positions', draw.fingerprint, count),
+                        lambda: PositionMatrix(draw, count))
+
+    @property
+    def forecast(self):
+        """Get the Forecast of cards drawn within the next draws"""
+        if self._forecast is None:
+            from odds import Forecast
+            self._forecast = Forecast(self.deck['draw'])
+        return self._forecast
 
     @property
     def top_freq(self):
         """Get the card count of the highest frequency"""
-        return self.most_common[0][1]
+        return self._top_freq
 
     @property
     def percentage(self):
         """Get the highest frequency card draw probablity as a percentage"""
-        return self.top_freq / len(self.deck['draw'].top())
+        return self._top_freq / len(self._pool)
 
     @property
     def top_cards(self):
         """Get a list of all the cards that share the top frequency"""
-        return [card[0] for card in self.most_common
-                if card[1] == self.top_freq]
+        return list(self._freq.get(self._top_freq, ()))
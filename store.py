@@ -0,0 +1,167 @@
+"""
+SQLite store of games and their events.
+
+Every game gets a row in the games table holding its latest state,
+and every action adds a row to the events table. Both are written
+in one transaction per action, so saving costs the same at the start
+of a campaign and after hundreds of turns. Resuming a game reads back
+a single state, without replaying any events.
+
+Events are indexed by card, so past games can be queried quickly:
+    store.events(card='Lagos', kind='epidemic')
+"""
+
+import pickle
+import sqlite3
+import time
+
+from decks import Card
+from game import Event
+
+import logging
+logger = logging.getLogger(__name__)
+
+STORE_FILE = 'games.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    started REAL NOT NULL,
+    updated REAL NOT NULL,
+    events INTEGER NOT NULL DEFAULT 0,
+    state BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_updated ON games (updated);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    game INTEGER NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+    time REAL NOT NULL,
+    kind TEXT NOT NULL,
+    card TEXT,
+    color TEXT,
+    source TEXT,
+    target TEXT,
+    position TEXT
+);
+CREATE INDEX IF NOT EXISTS events_game ON events (game, id);
+CREATE INDEX IF NOT EXISTS events_card ON events (card, kind);
+"""
+
+# The statements run on every action are constant strings,
+# so sqlite3 prepares them once and reuses them from its cache.
+INSERT_GAME = 'INSERT INTO games (title, started, updated, state) ' \
+              'VALUES (?, ?, ?, ?)'
+INSERT_EVENT = 'INSERT INTO events (game, time, kind, card, color, ' \
+               'source, target, position) VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+UPDATE_GAME = 'UPDATE games SET updated = ?, events = events + ?, ' \
+              'state = ? WHERE id = ?'
+
+
+class Store:
+    """Saves the games played with a Game in an SQLite database."""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+        self.game = None
+        self.game_id = None     # Row of the game being played
+
+    def attach(self, game):
+        """Save the games played with a Game from now on."""
+        self.game = game
+        game.subscribe(self.record)
+
+    def record(self, event):
+        if event.kind == 'new':
+            self.start()
+        elif self.game_id is not None:
+            # The moves of a batch are saved in a single transaction
+            self.append(*(event.events if event.kind == 'batch'
+                          else [event]))
+
+    def start(self):
+        """Add a row for a new game, with its initial state."""
+        now = time.time()
+        with self.connection:
+            cursor = self.connection.execute(
+                INSERT_GAME, (self.game.title, now, now, self.state()))
+        self.game_id = cursor.lastrowid
+
+    def append(self, *events):
+        """Add events and the resulting state of the game."""
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(INSERT_EVENT, [(
+                self.game_id, now, event.kind,
+                event.card and event.card.name,
+                event.card and event.card.color,
+                event.source, event.target, event.position)
+                for event in events])
+            self.connection.execute(
+                UPDATE_GAME, (now, len(events), self.state(), self.game_id))
+
+    def state(self):
+        return pickle.dumps(self.game.snapshot(), pickle.HIGHEST_PROTOCOL)
+
+    def last_game(self):
+        """Return (id, title, updated) of the game played last, or None."""
+        return self.connection.execute(
+            'SELECT id, title, updated FROM games '
+            'ORDER BY updated DESC LIMIT 1').fetchone()
+
+    def games(self):
+        """Return (id, title, started, updated, events) for every game,
+        most recent first."""
+        return self.connection.execute(
+            'SELECT id, title, started, updated, events FROM games '
+            'ORDER BY updated DESC').fetchall()
+
+    def resume(self, game_id=None):
+        """Restore the attached game to the saved state of a game,
+        by default the last one, and carry on saving it."""
+        if game_id is None:
+            game_id = self.last_game()[0]
+        row = self.connection.execute(
+            'SELECT state FROM games WHERE id = ?', (game_id,)).fetchone()
+        if row is None:
+            raise ValueError(f'No saved game {game_id}')
+        state = pickle.loads(row[0])
+        logger.info(f'Resuming {state.title} (game {game_id})')
+        self.game.restore(state)
+        self.game.log.clear()
+        self.game.log.log(f'<b>Resumed game: {state.title}</b>\n')
+        self.game_id = game_id
+
+    def events(self, game_id=None, kind=None, card=None):
+        """Return (game id, time, Event) for the saved events,
+        optionally of a game, of a kind or with a card name,
+        oldest first."""
+        conditions, values = [], []
+        for column, value in [('game', game_id), ('kind', kind),
+                              ('card', card)]:
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                values.append(value)
+        where = f'WHERE {" AND ".join(conditions)} ' if conditions else ''
+        rows = self.connection.execute(
+            'SELECT game, time, kind, card, color, source, target, position '
+            f'FROM events {where}ORDER BY id', values)
+        return [(game, timestamp, Event(
+                    kind, name and Card(name, color), source, target,
+                    position))
+                for game, timestamp, kind, name, color, source, target,
+                position in rows]
+
+    def delete(self, game_id):
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM games WHERE id = ?', (game_id,))
+        if game_id == self.game_id:
+            self.game_id = None
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,96 @@
+import unittest
+from unittest.case import TestCase
+from unittest.mock import patch
+import logging
+import os
+import tempfile
+
+from catalog import Catalog
+from decks import Card
+
+CARDS = """
+Test Game:
+  - name: Atlanta
+    count: 2
+    color: blue
+  - name: Lagos
+    count: 1
+    color: yellow
+Other Game:
+  - name: Paris
+    count: 3
+    color: blue
+"""
+
+
+class TestCatalog(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'cards.yml')
+        self.write(CARDS)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, text, mtime=None):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(self.path, ns=(mtime, mtime))
+
+    def catalog(self):
+        return Catalog(self.path, cache_dir=self.dir.name)
+
+    def test_games_and_lazy_decks(self):
+        catalog = self.catalog()
+        self.assertEqual(list(catalog), ['Test Game', 'Other Game'])
+        self.assertEqual(catalog._decks, {})
+        deck = catalog['Test Game']
+        self.assertEqual(len(deck), 3)
+        self.assertEqual(deck.count(Card('Atlanta', 'blue')), 2)
+        self.assertIs(catalog['Test Game'], deck)
+        self.assertNotIn('Other Game', catalog._decks)
+
+    def test_cache_is_used(self):
+        self.catalog()
+        with patch('catalog.Catalog.parse') as load:
+            catalog = self.catalog()
+            load.assert_not_called()
+        self.assertEqual(len(catalog['Other Game']), 3)
+
+    def test_touched_file_reuses_cache(self):
+        self.catalog()
+        self.write(CARDS, mtime=1)
+        with patch('catalog.Catalog.parse') as load:
+            self.catalog()
+            load.assert_not_called()
+
+    def test_changed_file_rebuilds_cache(self):
+        self.catalog()
+        self.write(CARDS.replace('count: 3', 'count: 4'))
+        self.assertEqual(len(self.catalog()['Other Game']), 4)
+
+    def test_invalid_color(self):
+        self.write(CARDS.replace('yellow', 'pink'))
+        with self.assertRaises(ValueError):
+            self.catalog()
+
+    def test_missing_file(self):
+        os.remove(self.path)
+        with patch('builtins.print'):
+            self.assertEqual(len(self.catalog()), 0)
+
+    def test_unwritable_cache_dir(self):
+        # Importing epidemic, as test_app does, disables logging
+        self.addCleanup(logging.disable, logging.root.manager.disable)
+        logging.disable(logging.NOTSET)
+        with patch('utility.os.makedirs', side_effect=PermissionError), \
+                self.assertLogs('catalog', 'WARNING'):
+            catalog = Catalog(self.path)
+        self.assertIsNone(catalog.cache_path)
+        self.assertEqual(catalog['Test Game'].count(Card('Lagos', 'yellow')),
+                         1)
+
+
+if __name__ == '__main__':
+    unittest.main()
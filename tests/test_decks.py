@@ -1,5 +1,7 @@
 import unittest
 from unittest.case import TestCase
+import random
+import threading
 from unittest.mock import patch
 
 from decks import Card, Deck, DrawDeck
@@ -20,6 +22,35 @@ class TestCard(TestCase):
         with self.assertRaises(ValueError):
             card = Card('Test Card', [42])
 
+    def test_cards_are_interned(self):
+        card = Card('Test Card', 'black')
+        self.assertIs(card, Card('Test Card', 'black'))
+        self.assertIsNot(card, Card('Test Card', 'blue'))
+        self.assertIs(Card.registry[card.id], card)
+
+    def test_cards_are_interned_across_threads(self):
+        names = [f'Thread Card {i}' for i in range(200)]
+
+        def intern():
+            for name in names:
+                Card(name, 'red')
+
+        threads = [threading.Thread(target=intern) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ids = [Card(name, 'red').id for name in names]
+        self.assertEqual(len(set(ids)), len(names))
+        self.assertEqual(len(Card.registry), len(Card.interned))
+        for card_id in ids:
+            self.assertEqual(Card.registry[card_id].id, card_id)
+
+    def test_cards_are_immutable(self):
+        card = Card('Test Card', 'black')
+        with self.assertRaises(AttributeError):
+            card.name = 'Other Card'
+
 
 class TestDeck(TestCase):
     def setUp(self):
@@ -69,6 +100,59 @@ class TestDeck(TestCase):
         self.assertNotIn(self.card1, self.deck)
         self.assertIn(self.card1, deck2)
 
+    def test_counting_duplicate_cards(self):
+        for card in [self.card1, self.card2, self.card1]:
+            self.deck.add(card)
+        self.assertEqual(self.deck.count(self.card1), 2)
+        self.assertEqual(self.deck.count(self.card3), 0)
+        self.assertEqual(list(self.deck.unique()), [self.card1, self.card2])
+        self.deck.remove(self.card1)
+        self.assertIn(self.card1, self.deck)
+        self.deck.remove(self.card1)
+        self.assertNotIn(self.card1, self.deck)
+        self.assertEqual(self.deck.items(), [(self.card2, 1)])
+
+    def test_copies_do_not_share_changes(self):
+        self.deck.add(self.card1)
+        self.deck.add(self.card2)
+        copy = self.deck.copy('copy')
+        self.assertEqual(copy.name, 'copy')
+        self.assertEqual(copy.cards, self.deck.cards)
+        copy.remove(self.card1)
+        self.assertIn(self.card1, self.deck)
+        self.deck.add(self.card3)
+        self.assertNotIn(self.card3, copy)
+        self.assertEqual(len(copy), 1)
+        self.assertEqual(len(self.deck), 3)
+
+    def test_find_card_by_name(self):
+        self.deck.add(self.card1)
+        copy = self.deck.copy()
+        copy.add(self.card2)
+        self.assertIs(copy.find('Card B'), self.card2)
+        self.assertIsNone(self.deck.find('Card B'))
+        copy.remove(self.card1)
+        self.assertIsNone(copy.find('Card A'))
+        self.assertIs(self.deck.find('Card A'), self.card1)
+        self.deck.load(copy.freeze())
+        self.assertIs(self.deck.find('Card B'), self.card2)
+
+    def test_fingerprint_depends_on_contents_only(self):
+        other = Deck('other')
+        for card in [self.card1, self.card2, self.card1]:
+            self.deck.add(card)
+        for card in [self.card2, self.card1, self.card1]:
+            other.add(card)
+        self.assertEqual(self.deck.fingerprint, other.fingerprint)
+        before = self.deck.fingerprint
+        self.deck.move(self.card2, other)
+        self.assertNotEqual(self.deck.fingerprint, before)
+        other.move(self.card2, self.deck)
+        self.assertEqual(self.deck.fingerprint, before)
+        self.assertEqual(self.deck.copy().fingerprint, before)
+        self.deck.clear()
+        self.assertEqual(self.deck.fingerprint, 0)
+
     def test_clear_a_deck_and_check_if_empty(self):
         self.deck.add(self.card1)
         self.deck.clear()
@@ -88,5 +172,120 @@ class TestDeck(TestCase):
         self.assertEqual(sorted[2], self.card3)
 
 
+class TestDrawDeck(TestCase):
+    def setUp(self):
+        self.card1 = Card('Card A', 'black')
+        self.card2 = Card('Card B', 'blue')
+        self.card3 = Card('Card C', 'red')
+        starter = Deck('Starter Deck')
+        for card in [self.card1, self.card1, self.card2]:
+            starter.add(card)
+        self.deck = DrawDeck('draw')
+        self.deck.add(starter)
+        self.starter = starter
+
+    def test_pool_added_as_single_segment(self):
+        self.assertEqual(len(self.deck), 3)
+        self.assertEqual(len(self.deck.segments), 1)
+        self.assertIs(self.deck.top(), self.starter)
+        self.assertIs(self.deck.bottom(), self.starter)
+        self.assertIs(self.starter.parent, self.deck)
+
+    def test_adding_cards_at_each_position(self):
+        self.deck.add(self.card3, position='top')
+        self.assertEqual(len(self.deck.segments), 1)
+        self.deck.add(self.card3, position='single')
+        self.assertEqual(len(self.deck.segments), 2)
+        self.assertEqual(len(self.deck.top()), 1)
+        self.deck.add(self.card3, position='bottom')
+        self.assertEqual(len(self.deck.bottom()), 5)
+        self.assertEqual(len(self.deck), 6)
+
+    def test_drawing_from_top_and_bottom(self):
+        self.deck.add(self.card3, position='single')
+        self.deck.remove(self.card3)
+        self.assertEqual(len(self.deck.segments), 1)
+        self.deck.remove_from_bottom(self.card2)
+        self.assertEqual(len(self.deck), 2)
+        self.deck.remove(self.card1)
+        self.deck.remove(self.card1)
+        self.assertTrue(self.deck.is_empty())
+        self.assertEqual(len(self.deck), 0)
+
+    def test_get_card_from_bottom(self):
+        self.deck.add(self.card3, position='single')
+        self.assertIs(self.deck.get_card_from_bottom('Card B'), self.card2)
+        with self.assertRaises(AssertionError):
+            self.deck.get_card_from_bottom('Card C')
+
+    def test_fingerprint_is_incremental(self):
+        rng = random.Random(1)
+        cards = [self.card1, self.card2, self.card3]
+        seen = {}
+        for step in range(300):
+            action = rng.choice(['top', 'bottom', 'single', 'draw',
+                                 'draw_bottom', 'epidemic'])
+            if action in ('top', 'bottom', 'single'):
+                self.deck.add(rng.choice(cards), position=action)
+            elif self.deck.is_empty():
+                continue
+            elif action == 'draw':
+                self.deck.remove(rng.choice(list(self.deck.top().unique())))
+            elif action == 'draw_bottom':
+                self.deck.remove_from_bottom(
+                    rng.choice(list(self.deck.bottom().unique())))
+            else:
+                pool = Deck('Epidemic')
+                pool.add(rng.choice(cards))
+                self.deck.add(pool)
+
+            copy = DrawDeck('copy')
+            copy.load(self.deck.freeze())
+            self.assertEqual(self.deck.fingerprint, copy.fingerprint)
+            frozen = self.deck.freeze()
+            counts = tuple((cards, count) for name, cards, count in frozen)
+            self.assertEqual(seen.setdefault(self.deck.fingerprint, counts),
+                             counts)
+
+    def test_fingerprint_depends_on_depth(self):
+        pool = Deck('Epidemic #1')
+        pool.add(self.card3)
+        self.deck.add(pool)
+        self.deck.add(self.card3, position='bottom')
+        reordered = DrawDeck('draw')
+        reordered.add(pool.copy())
+        starter = self.starter.copy()
+        starter.add(self.card3)
+        reordered.add(starter)
+        self.assertNotEqual(self.deck.fingerprint, reordered.fingerprint)
+
+    def test_pool_lookup_by_position(self):
+        epidemic = Deck('Epidemic #1')
+        epidemic.add(self.card3)
+        self.deck.add(epidemic)
+        self.assertIs(self.deck.pool_at(0), epidemic)
+        self.assertIs(self.deck.pool_at(1), self.starter)
+        self.assertIs(self.deck.pool_at(3), self.starter)
+        with self.assertRaises(IndexError):
+            self.deck.pool_at(4)
+        self.assertEqual(list(self.deck), [self.starter] * 3 + [epidemic])
+
+    def test_copies_do_not_share_changes(self):
+        copy = self.deck.copy()
+        self.assertEqual(copy.fingerprint, self.deck.fingerprint)
+        self.assertIs(copy.top().parent, copy)
+        copy.remove(self.card1)
+        copy.add(self.card3, position='bottom')
+        self.assertEqual(len(self.deck), 3)
+        self.assertEqual(self.starter.count(self.card1), 2)
+        self.assertEqual(self.starter.count(self.card3), 0)
+        reloaded = DrawDeck('draw')
+        reloaded.load(copy.freeze())
+        self.assertEqual(copy.fingerprint, reloaded.fingerprint)
+
+    def test_sorted_unique_top_cards(self):
+        self.assertEqual(self.deck.sorted(), [self.card1, self.card2])
+
+
 if __name__ == '__main__':
     unittest.main()
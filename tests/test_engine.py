@@ -0,0 +1,113 @@
+import unittest
+from unittest.case import TestCase
+import io
+import os
+import subprocess
+import sys
+import tempfile
+
+from engine import Engine
+from cli import Shell
+from journal import Journal
+from metrics import metrics
+
+GAME = 'Legacy Season 2 (Full)'
+
+
+class TestEngine(TestCase):
+    def setUp(self):
+        self.engine = Engine()
+        self.engine.new_game(GAME)
+
+    def test_no_qt_import(self):
+        # In a fresh interpreter, as other tests may have imported Qt
+        code = ('import sys, engine, cli; '
+                'sys.exit("PySide2" in sys.modules)')
+        result = subprocess.run([sys.executable, '-c', code],
+                                cwd=os.path.dirname(os.path.dirname(
+                                    os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 0)
+
+    def test_infect_and_stats(self):
+        total = self.engine.stats()['total']
+        self.engine.infect('atlanta')
+        stats = self.engine.stats()
+        self.assertEqual(stats['in_discard'], 1)
+        self.assertEqual(stats['in_draw'], total - 1)
+        self.assertEqual(self.engine.cards('discard'), [('Atlanta', 1)])
+        with self.assertRaises(ValueError):
+            self.engine.infect('Atlanta')
+
+    def test_move_and_epidemic(self):
+        self.engine.infect('Lagos')
+        self.engine.move('Lagos', 'discard', 'single')
+        self.assertEqual(self.engine.pool(0), [('Lagos', 1, 1.0)])
+        self.engine.infect('Lagos')
+        self.engine.epidemic('Paris')
+        self.assertEqual(self.engine.cards('draw'),
+                         [('Lagos', 1), ('Paris', 1)])
+        self.assertEqual(self.engine.chance('Paris', 2), 1)
+        self.assertEqual(self.engine.log()[-1], 'Epidemic #1 (Paris) shuffled')
+
+    def test_invalid_requests(self):
+        with self.assertRaises(ValueError):
+            self.engine.new_game('Not a game')
+        with self.assertRaises(ValueError):
+            self.engine.move('Lagos', 'draw', 'nowhere')
+        with self.assertRaises(ValueError):
+            self.engine.chance('Atlantis', 1)
+        with self.assertRaises(ValueError):
+            Engine(self.engine.game.__class__()).infect('Lagos')
+
+
+class TestShell(TestCase):
+    def run_commands(self, *commands):
+        output = io.StringIO()
+        shell = Shell(Engine(), stdout=output)
+        for command in commands:
+            shell.onecmd(command)
+        return output.getvalue().splitlines()
+
+    def test_commands(self):
+        output = self.run_commands(f'new {GAME}', 'infect Lagos',
+                                   'move discard single Lagos', 'pool',
+                                   'chance 1 lagos', 'chance 1 black')
+        self.assertEqual(output[1:5],
+                         ['Lagos infected', 'Lagos moved (discard -> single)',
+                          'Lagos (1, 100%)', '100.00%'])
+        self.assertEqual(output[5], '0.00%')
+
+    def test_errors_are_reported(self):
+        output = self.run_commands('infect Lagos', 'chance x',
+                                   'chance 3 blue')
+        self.assertEqual(output, ['Error: No game in progress',
+                                  'Error: Usage: chance DRAWS '
+                                  'CITY[, CITY...] | COLOR',
+                                  'Error: No game in progress'])
+
+    def test_log_all_from_journal(self):
+        self.assertEqual(self.run_commands('log all'),
+                         ['Error: No journal, start with --journal DIR'])
+        with tempfile.TemporaryDirectory() as path:
+            output = io.StringIO()
+            engine = Engine()
+            journal = Journal(path)
+            journal.attach(engine.game)
+            shell = Shell(engine, stdout=output, journal=journal)
+            for command in [f'new {GAME}', 'infect Lagos', 'infect Paris',
+                            'undo', 'log all']:
+                shell.onecmd(command)
+            journal.close()
+        self.assertTrue(output.getvalue().splitlines()[-1].endswith(
+            'Lagos (draw -> discard)'))
+
+    def test_metrics(self):
+        output = self.run_commands(f'new {GAME}', 'metrics on',
+                                   'infect Lagos', 'metrics off', 'metrics')
+        self.assertEqual(output[1], 'Metrics on')
+        self.assertIn('Game.draw_card', output[-2] + output[-1])
+        metrics.reset()
+
+
+if __name__ == '__main__':
+    unittest.main()
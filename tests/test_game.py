@@ -1,7 +1,7 @@
 import unittest
 from unittest.case import TestCase
 
-from game import Log
+from game import Game, Log, Move
 
 
 class TestLog(TestCase):
@@ -17,8 +17,160 @@ class TestLog(TestCase):
         self.assertEqual(len(self.log), 2)
         self.assertEqual(self.log[-1], 'Something else')
 
-    def test_get_recent_entries(self, entries):
-        pass
+    def test_get_recent_entries(self):
+        for i in range(5):
+            self.log.log(f'Entry {i}')
+        self.assertEqual(self.log.recent(2), ['Entry 3', 'Entry 4'])
+        self.assertEqual(len(self.log.recent(10)), 5)
+
+    def test_log_is_bounded(self):
+        log = Log(limit=3)
+        for i in range(5):
+            log.log(f'Entry {i}')
+        self.assertEqual(list(log), ['Entry 2', 'Entry 3', 'Entry 4'])
+        self.assertEqual(log[0], 'Entry 2')
+
+
+class TestUndo(TestCase):
+    def setUp(self):
+        self.game = Game()
+        self.game.initialise('Legacy Season 2 (Full)')
+        self.draw = self.game.deck['draw']
+        self.discard = self.game.deck['discard']
+
+    def infect(self, count):
+        for i in range(count):
+            card = self.draw.sorted()[0]
+            self.game.draw_card(self.draw, self.discard, card)
+
+    def test_undo_and_redo(self):
+        start = self.game.snapshot()
+        self.infect(3)
+        after = self.game.snapshot()
+        self.game.undo()
+        self.assertEqual(len(self.discard), 2)
+        self.game.undo()
+        self.game.undo()
+        self.assertEqual(self.game.snapshot(), start)
+        self.game.undo()  # Nothing left to undo
+        self.assertEqual(self.game.snapshot(), start)
+        for i in range(3):
+            self.game.redo()
+        self.assertEqual(self.game.snapshot(), after)
+
+    def test_undo_epidemic(self):
+        self.infect(2)
+        before = self.game.snapshot()
+        self.game.epidemic(self.draw.bottom().sorted()[0].name)
+        self.assertEqual(self.game.epidemic_count, 1)
+        self.game.undo()
+        self.assertEqual(self.game.snapshot(), before)
+        self.assertEqual(self.game.epidemic_count, 0)
+
+    def test_new_action_clears_redo(self):
+        self.infect(2)
+        self.game.undo()
+        self.infect(1)
+        self.assertFalse(self.game.history.can_redo())
+
+    def test_states_share_unchanged_segments(self):
+        self.infect(1)
+        self.game.epidemic(self.draw.bottom().sorted()[0].name)
+        self.infect(1)
+        previous = self.game.history.undo_stack[-1]
+        current = self.game.snapshot()
+        # Only the top segment changed, the bottom one is shared
+        self.assertIs(previous.draw[0][1], current.draw[0][1])
+        self.assertIsNot(previous.draw[-1][1], current.draw[-1][1])
+
+
+class TestApply(TestCase):
+    def setUp(self):
+        self.game = Game()
+        self.game.initialise('Legacy Season 2 (Full)')
+        self.draw = self.game.deck['draw']
+        self.discard = self.game.deck['discard']
+        self.cards = self.draw.sorted()[:3]
+        self.events = []
+        self.game.subscribe(self.events.append)
+
+    def test_moves_are_one_action(self):
+        start = self.game.snapshot()
+        entries = len(self.game.log)
+        self.game.apply([Move(card, 'draw', 'discard')
+                         for card in self.cards])
+        self.assertEqual(len(self.discard), 3)
+        self.assertEqual(len(self.game.log), entries + 1)
+        self.assertIn(self.cards[2].name, self.game.log[-1])
+        self.assertEqual([event.kind for event in self.events], ['batch'])
+        self.assertEqual([event.card for event in self.events[0].events],
+                         self.cards)
+        self.game.undo()
+        self.assertEqual(self.game.snapshot(), start)
+
+    def test_failed_move_rolls_back(self):
+        start = self.game.snapshot()
+        moves = [(self.cards[0], 'draw', 'discard'),
+                 (self.cards[1], 'discard', 'exclude')]
+        with self.assertRaises(ValueError):
+            self.game.apply(moves)
+        self.assertEqual(self.game.snapshot(), start)
+        self.assertFalse(self.game.history.can_undo())
+        self.assertEqual(self.events, [])
+
+    def test_moves_are_validated(self):
+        card = self.cards[0]
+        for move in [Move(card, 'draw', 'draw', 'top'),
+                     Move(card, 'draw', 'nowhere'),
+                     Move(card, 'discard', 'draw', 'deck')]:
+            with self.assertRaises(ValueError):
+                self.game.apply([move])
+        self.assertEqual(self.events, [])
+
+
+class TestPreview(TestCase):
+    def setUp(self):
+        self.game = Game()
+        self.game.initialise('Legacy Season 2 (Full)')
+        self.draw = self.game.deck['draw']
+        self.discard = self.game.deck['discard']
+        for card in self.draw.sorted()[:3]:
+            self.game.draw_card(self.draw, self.discard, card)
+
+    def assertSameStats(self, preview, stats):
+        self.assertEqual(preview.percentage, stats.percentage)
+        self.assertEqual(preview.top_cards, stats.top_cards)
+        self.assertEqual(preview.in_discard, stats.in_discard)
+        self.assertEqual(preview.deck['draw'].fingerprint,
+                         stats.deck['draw'].fingerprint)
+
+    def test_preview_draw(self):
+        start = self.game.snapshot()
+        steps = len(self.game.history.undo_stack)
+        card = self.discard.sorted()[0]
+        preview = self.game.preview_draw(card, 'discard', 'draw', 'top')
+        self.assertEqual(self.game.snapshot(), start)
+        self.assertEqual(len(self.game.history.undo_stack), steps)
+        self.game.draw_card(self.discard, self.draw, card, position='top')
+        self.assertSameStats(preview, self.game.stats)
+
+    def test_preview_epidemic(self):
+        start = self.game.snapshot()
+        name = self.draw.bottom().sorted()[0].name
+        preview = self.game.preview_epidemic(name)
+        self.assertEqual(self.game.snapshot(), start)
+        self.game.epidemic(name)
+        self.assertSameStats(preview, self.game.stats)
+
+    def test_preview_checks_the_move(self):
+        with self.assertRaises(ValueError):
+            self.game.preview_draw(self.draw.sorted()[0], 'draw', 'draw',
+                                   'top')
+        drawn = self.discard.sorted()[0]
+        with self.assertRaises(ValueError):
+            self.game.preview_draw(drawn, 'draw', 'exclude', 'deck')
+        with self.assertRaises(ValueError):
+            self.game.preview_epidemic(drawn.name)
 
 
 if __name__ == '__main__':
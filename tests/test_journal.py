@@ -0,0 +1,139 @@
+import unittest
+from unittest.case import TestCase
+import os
+import tempfile
+from collections import deque
+
+from engine import Engine
+from game import Game, Move
+from journal import Journal
+
+GAME = 'Legacy Season 2 (Full)'
+
+
+class TestJournal(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.engine = Engine()
+        self.journal = Journal(self.dir.name, snapshot_every=4)
+        self.journal.attach(self.engine.game)
+        self.engine.new_game(GAME)
+
+    def tearDown(self):
+        self.journal.close()
+        self.dir.cleanup()
+
+    def play(self):
+        for name in ['Lagos', 'Paris', 'Jakarta']:
+            self.engine.infect(name)
+        self.engine.move('Paris', 'discard', 'exclude')
+        self.engine.epidemic('Londres')
+        self.engine.infect('Lagos')
+        self.engine.move('Lagos', 'discard', 'bottom')
+
+    def restored(self):
+        game = Game()
+        journal = Journal(self.dir.name)
+        journal.attach(game)
+        journal.restore()
+        journal.close()
+        return game
+
+    def test_events_are_recorded(self):
+        self.play()
+        events = [event for timestamp, event in self.journal.read()]
+        self.assertEqual(len(events), 7)
+        self.assertEqual(events[0].kind, 'draw')
+        self.assertEqual(events[0].card.name, 'Lagos')
+        self.assertEqual(events[3].kind, 'move')
+        self.assertEqual(events[3].target, 'exclude')
+        self.assertEqual(events[4].kind, 'epidemic')
+        self.assertEqual(events[6].position, 'bottom')
+
+    def test_history_outlives_the_game_log(self):
+        self.engine.game.log.entries = deque(maxlen=2)
+        self.play()
+        history = self.journal.history()
+        self.assertEqual(len(history), 7)
+        self.assertTrue(history[0].endswith('Lagos (draw -> discard)'))
+        self.assertTrue(history[4].endswith('Epidemic #1 (Londres) shuffled'))
+        self.assertEqual(len(self.engine.game.log), 2)
+
+    def test_restore_from_snapshot_and_tail(self):
+        self.play()
+        offset, state = self.journal.read_snapshot()
+        self.assertGreater(offset, 0)
+        self.assertEqual(len(self.journal.read(offset)), 3)
+        self.assertEqual(self.restored().snapshot(),
+                         self.engine.game.snapshot())
+
+    def test_restore_ignores_partial_record(self):
+        self.play()
+        self.journal.close()
+        with open(os.path.join(self.dir.name, 'journal.bin'), 'ab') as f:
+            f.write(b'\x00\x00')
+        self.assertEqual(self.restored().snapshot(),
+                         self.engine.game.snapshot())
+
+    def test_restore_twice_keeps_later_events(self):
+        self.play()
+        self.journal.close()
+        with open(os.path.join(self.dir.name, 'journal.bin'), 'ab') as f:
+            f.write(b'\x00\x00')
+        game = Game()
+        journal = Journal(self.dir.name)
+        journal.attach(game)
+        journal.restore()
+        Engine(game).infect('Jakarta')
+        journal.close()
+        self.assertEqual(self.restored().snapshot(), game.snapshot())
+
+    def test_restore_after_undo(self):
+        self.play()
+        self.engine.undo()
+        self.engine.undo()
+        self.engine.infect('Jakarta')
+        self.assertEqual(self.restored().snapshot(),
+                         self.engine.game.snapshot())
+
+    def test_batch_is_recorded_and_restored(self):
+        self.play()
+        game = self.engine.game
+        game.apply([Move(self.engine.card(name), 'draw', 'discard')
+                    for name in ['Jakarta', 'Londres']])
+        timestamp, batch = self.journal.read()[-1]
+        self.assertEqual(batch.kind, 'batch')
+        self.assertEqual([event.card.name for event in batch.events],
+                         ['Jakarta', 'Londres'])
+        self.assertTrue(self.journal.history()[-1].endswith(
+            'Jakarta (draw -> discard), Londres (draw -> discard)'))
+        self.assertEqual(self.restored().snapshot(), game.snapshot())
+
+    def test_history_leaves_out_undone_actions(self):
+        for name in ['Lagos', 'Paris', 'Jakarta']:
+            self.engine.infect(name)
+        self.engine.undo()
+        self.engine.undo()
+        self.engine.redo()
+        history = self.journal.history()
+        self.assertEqual(len(history), 2)
+        self.assertTrue(history[-1].endswith('Paris (draw -> discard)'))
+        self.assertEqual(self.restored().snapshot(),
+                         self.engine.game.snapshot())
+
+    def test_history_numbers_epidemics_of_a_resumed_game(self):
+        self.play()
+        self.journal.start()    # As after resuming from the store
+        self.engine.epidemic('Londres')
+        self.assertTrue(self.journal.history()[-1].endswith(
+            'Epidemic #2 (Londres) shuffled'))
+
+    def test_new_game_resets_journal(self):
+        self.play()
+        self.engine.new_game(GAME)
+        self.assertEqual(self.journal.read(), [])
+        self.assertEqual(self.restored().epidemic_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
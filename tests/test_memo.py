@@ -0,0 +1,35 @@
+import unittest
+from unittest.case import TestCase
+
+from memo import Memo
+
+
+class TestMemo(TestCase):
+    def setUp(self):
+        self.memo = Memo(size=2)
+        self.calls = []
+
+    def compute(self, value):
+        def compute():
+            self.calls.append(value)
+            return value
+        return compute
+
+    def test_results_are_reused(self):
+        self.assertEqual(self.memo.get('a', self.compute(1)), 1)
+        self.assertEqual(self.memo.get('a', self.compute(2)), 1)
+        self.assertEqual(self.calls, [1])
+        self.assertEqual((self.memo.hits, self.memo.misses), (1, 1))
+
+    def test_least_recently_used_result_is_dropped(self):
+        self.memo.get('a', self.compute(1))
+        self.memo.get('b', self.compute(2))
+        self.memo.get('a', self.compute(1))
+        self.memo.get('c', self.compute(3))
+        self.assertEqual(len(self.memo), 2)
+        self.assertIn('a', self.memo.results)
+        self.assertNotIn('b', self.memo.results)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from unittest.case import TestCase
+
+from metrics import Histogram, Metrics
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def add(self, count=1):
+        self.calls += count
+        return self.calls
+
+    def update_view(self):
+        return 'view'
+
+    @staticmethod
+    def update_static():
+        return 'static'
+
+
+class TestHistogram(TestCase):
+    def test_percentiles(self):
+        histogram = Histogram()
+        for i in range(1, 101):
+            histogram.add(i / 1000)
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.percentile(50), 0.050, delta=0.005)
+        self.assertAlmostEqual(histogram.percentile(99), 0.099, delta=0.009)
+        self.assertEqual(histogram.percentile(100), 0.1)
+        self.assertAlmostEqual(histogram.summary()['mean_ms'], 50.5)
+
+    def test_empty_histogram(self):
+        self.assertEqual(Histogram().summary()['count'], 0)
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.cls = type('Counter', (Counter,), dict(vars(Counter)))
+        self.metrics.instrument(self.cls, 'add', 'update_*')
+
+    def test_nothing_recorded_while_disabled(self):
+        counter = self.cls()
+        self.assertEqual(counter.add(2), 2)
+        self.assertEqual(self.metrics.report(), {})
+
+    def test_calls_are_recorded(self):
+        self.metrics.enable()
+        counter = self.cls()
+        counter.add()
+        counter.add()
+        self.assertEqual(counter.update_view(), 'view')
+        self.assertEqual(self.cls.update_static(), 'static')
+        report = self.metrics.report()
+        self.assertEqual(report['Counter.add']['count'], 2)
+        self.assertEqual(report['Counter.update_static']['count'], 1)
+        self.assertIn('Counter.update_view', self.metrics.format())
+
+        self.metrics.reset()
+        self.assertEqual(self.metrics.report(), {})
+
+    def test_methods_are_wrapped_once(self):
+        self.metrics.instrument(self.cls, 'add')
+        self.metrics.enable()
+        self.cls().add()
+        self.assertEqual(self.metrics.report()['Counter.add']['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from unittest.case import TestCase
+
+from decks import Card, Deck, DrawDeck
+from memo import memo
+from odds import PositionMatrix, Forecast
+
+
+class TestPositionMatrix(TestCase):
+    def setUp(self):
+        self.card1 = Card('Card A', 'black')
+        self.card2 = Card('Card B', 'blue')
+        self.card3 = Card('Card C', 'red')
+        starter = Deck('Starter Deck')
+        for card in [self.card1, self.card1, self.card2, self.card3]:
+            starter.add(card)
+        epidemic = Deck('Epidemic #1')
+        for card in [self.card2, self.card3]:
+            epidemic.add(card)
+        self.deck = DrawDeck('draw')
+        self.deck.add(starter)
+        self.deck.add(epidemic)
+
+    def test_rows_follow_stacked_pools(self):
+        odds = PositionMatrix(self.deck)
+        self.assertEqual(len(odds), 6)
+        self.assertEqual(odds.cards, [self.card1, self.card2, self.card3])
+        self.assertEqual(odds.row(0), [(self.card2, .5), (self.card3, .5)])
+        self.assertEqual(odds.row(1), odds.row(0))
+        self.assertEqual(odds.probability(self.card1, 0), 0)
+        self.assertEqual(odds.probability(self.card1, 2), .5)
+        self.assertEqual(odds.probability(self.card3, 5), .25)
+        for row in odds.matrix:
+            self.assertAlmostEqual(row.sum(), 1)
+
+    def test_limiting_positions(self):
+        odds = PositionMatrix(self.deck, positions=3)
+        self.assertEqual(len(odds), 3)
+        self.assertEqual(odds.probability(self.card1, 2), .5)
+
+    def test_empty_deck(self):
+        odds = PositionMatrix(DrawDeck('draw'))
+        self.assertEqual(len(odds), 0)
+        self.assertEqual(odds.cards, [])
+
+
+class TestForecast(TestCase):
+    def setUp(self):
+        self.card1 = Card('Card A', 'black')
+        self.card2 = Card('Card B', 'blue')
+        self.card3 = Card('Card C', 'red')
+        starter = Deck('Starter Deck')
+        for card in [self.card1, self.card1, self.card2, self.card3]:
+            starter.add(card)
+        epidemic = Deck('Epidemic #1')
+        for card in [self.card2, self.card3]:
+            epidemic.add(card)
+        self.deck = DrawDeck('draw')
+        self.deck.add(starter)
+        self.deck.add(epidemic)
+        self.forecast = Forecast(self.deck)
+
+    def test_chance_within_top_segment(self):
+        self.assertEqual(self.forecast.city(self.card1, 2), 0)
+        self.assertEqual(self.forecast.city(self.card2, 1), .5)
+        self.assertEqual(self.forecast.city(self.card2, 2), 1)
+
+    def test_chance_across_segments(self):
+        # Miss both epidemic draws, then 2 of 4 starter cards
+        self.assertEqual(self.forecast.city(self.card1, 3), .5)
+        self.assertAlmostEqual(self.forecast.city(self.card1, 4), 5 / 6)
+        self.assertEqual(self.forecast.city(self.card1, 100), 1)
+        self.assertEqual(
+            self.forecast.cities([self.card1, self.card2], 1), .5)
+
+    def test_chance_by_color(self):
+        self.assertEqual(self.forecast.color('black', 3), .5)
+        self.assertEqual(self.forecast.color('yellow', 6), 0)
+        with self.assertRaises(ValueError):
+            self.forecast.color('pink', 1)
+
+    def test_cache_follows_deck_changes(self):
+        self.assertEqual(self.forecast.city(self.card1, 3), .5)
+        self.deck.remove(self.card2)
+        self.deck.remove(self.card3)
+        self.assertEqual(self.forecast.city(self.card1, 1), .5)
+
+    def test_same_state_is_memoized(self):
+        self.forecast.city(self.card1, 2)
+        other = DrawDeck('draw')
+        other.load(self.deck.freeze())
+        hits = memo.hits
+        self.assertEqual(Forecast(other).city(self.card1, 2),
+                         self.forecast.city(self.card1, 2))
+        self.assertEqual(memo.hits, hits + 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
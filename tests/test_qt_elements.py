@@ -1,6 +1,10 @@
 from unittest.case import TestCase
 import unittest
+import logging
 import qt
+from decks import Card, Deck
+from game import Game
+from memo import memo
 from PySide2.QtWidgets import QApplication
 from PySide2.QtWidgets import QRadioButton, QPushButton, QComboBox, QWidget
 
@@ -55,6 +59,99 @@ class TestQtElements(TestCase):
     def test_creation_of_stats_section(self):
         pass
 
+    def test_draw_deck_keeps_cards_sorted(self):
+        # Importing epidemic, as test_app does, disables logging
+        self.addCleanup(logging.disable, logging.root.manager.disable)
+        logging.disable(logging.NOTSET)
+        deck = qt.DrawDeck('DRAW CARD')
+        self.main.setLayout(deck)
+        card_a, card_b = Card('Card A', 'black'), Card('Card B', 'blue')
+        deck.add_card(card_b)
+        deck.add_card(card_a)
+        deck.add_card(card_a)
+        self.assertEqual(deck.cards, [card_a, card_b])
+        self.assertEqual(deck.model.rowCount(), 2)
+        self.assertEqual(deck.model.index(1).data(), 'Card B')
+        deck.remove_card(card_a)
+        self.assertEqual(deck.cards, [card_b])
+        with self.assertLogs(level='WARNING'):
+            deck.remove_card(Card('Card C', 'red'))
+        self.assertEqual(deck.cards, [card_b])
+
+    def test_draw_deck_update_only_changes_rows(self):
+        deck = qt.DrawDeck('DRAW CARD')
+        self.main.setLayout(deck)
+        cards = [Card(f'Card {c}', 'red') for c in 'ABCD']
+        deck.update_cards(cards[:3])
+        removed = []
+        deck.model.rowsRemoved.connect(
+            lambda parent, first, last: removed.append(first))
+        deck.update_cards(cards[1:])
+        self.assertEqual(deck.cards, cards[1:])
+        self.assertEqual(removed, [0])
+
+    def test_log_appends_in_batches(self):
+        log = qt.Log(max_lines=3)
+        for i in range(5):
+            log.log(f'Entry {i}')
+        self.assertEqual(log.edit.blockCount(), 1)
+        log.flush()
+        self.assertEqual(log.edit.toPlainText().split('\n'),
+                         ['Entry 2', 'Entry 3', 'Entry 4'])
+
+    def test_cardpool_caches_rendered_pools(self):
+        cardpool = qt.Cardpool()
+        pool = Deck('Epidemic #1')
+        for name in ['Lagos', 'Paris', 'Lagos']:
+            pool.add(Card(name, 'blue'))
+        cardpool.show('draw', 1, pool)
+        self.assertIn('Lagos (2, 67%)', cardpool._text.text())
+        self.assertIn(('cardpool', pool.fingerprint), memo.results)
+
+        pool.remove(Card('Lagos', 'blue'))
+        cardpool.show('draw', 2, pool)
+        self.assertIn('Lagos (1, 50%)', cardpool._text.text())
+        self.assertIn('Card position: 2', cardpool._text.text())
+
+    def test_epidemic_menu_follows_bottom_pool(self):
+        menu = qt.EpidemicMenu()
+        pool = Deck('Starter Deck')
+        for name in ['Paris', 'Lagos']:
+            pool.add(Card(name, 'blue'))
+        menu.show(pool)
+        self.assertEqual(menu.model.stringList(), ['Lagos', 'Paris'])
+        menu.combo_box.setCurrentIndex(1)
+
+        pool.add(Card('Milan', 'blue'))
+        menu.show(pool)
+        self.assertEqual(menu.model.stringList(), ['Lagos', 'Milan', 'Paris'])
+        self.assertEqual(menu.combo_box.currentText(), 'Paris')
+
+        menu.show_empty()
+        self.assertFalse(menu.button.isEnabled())
+
+    def test_stats_preview(self):
+        game = Game()
+        game.initialise('Legacy Season 2 (Full)')
+        draw = game.deck['draw']
+        card = draw.sorted()[0]
+        preview = game.preview_draw(card, 'draw', 'discard', 'deck')
+        text = qt.Stats().render_preview('Preview', preview)
+        self.assertIn('<b>Preview</b>', text)
+        self.assertIn(f'{preview.percentage:.2%}', text)
+        self.assertIn('In discard pile: 1', text)
+        self.assertIn('Draw 1: ', text)
+        self.assertIn(f'Next {qt.PREVIEW_DRAWS} draws: ', text)
+
+    def test_cardpool_chances_of_large_pools(self):
+        cardpool = qt.Cardpool()
+        cardpool.show_chances({'Lagos': 0.5, 'Paris': 0.25})
+        self.assertIn('Lagos 50%', cardpool._chances.text())
+        chances = {f'Card {i}': 0.01 for i in range(cardpool._max_cards)}
+        cardpool.show_chances(chances)
+        self.assertIn(f'{cardpool._max_cards}+ cards',
+                      cardpool._chances.text())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,196 @@
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.case import TestCase
+import asyncio
+import json
+import os
+import tempfile
+
+from game import Game
+from service import Service, Sessions
+
+GAME = 'Legacy Season 2 (Full)'
+
+
+class TestSessions(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.sessions = Sessions(Game.get_all_games(), self.dir.name,
+                                 capacity=2)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_least_recently_used_session_is_evicted(self):
+        first = self.sessions.create(GAME)
+        self.sessions.get(first).infect('Lagos')
+        second = self.sessions.create(GAME)
+        self.sessions.get(first)
+        self.sessions.create(GAME)
+        self.assertNotIn(second, self.sessions.live)
+        self.assertIn(first, self.sessions.live)
+        self.assertTrue(os.path.exists(self.sessions.file(second)))
+
+    def test_evicted_session_is_restored(self):
+        session = self.sessions.create(GAME)
+        engine = self.sessions.get(session)
+        engine.infect('Lagos')
+        engine.infect('Paris')
+        self.sessions.evict(session)
+        engine = self.sessions.get(session)
+        self.assertEqual(engine.stats()['in_discard'], 2)
+        self.assertTrue(engine.undo())
+        self.assertEqual(engine.stats()['in_discard'], 1)
+
+    def test_idle_sessions_are_evicted(self):
+        session = self.sessions.create(GAME)
+        self.sessions.evict_idle(0)
+        self.assertEqual(len(self.sessions.live), 0)
+        self.sessions.delete(session)
+        with self.assertRaises(KeyError):
+            self.sessions.get(session)
+
+    def test_evicted_session_is_deleted_without_loading(self):
+        session = self.sessions.create(GAME)
+        self.sessions.evict(session)
+        self.sessions.load = None   # Deleting must not unpickle it
+        self.sessions.delete(session)
+        self.assertFalse(os.path.exists(self.sessions.file(session)))
+        with self.assertRaises(KeyError):
+            self.sessions.delete(session)
+
+    def test_session_ids_are_checked(self):
+        with self.assertRaises(KeyError):
+            self.sessions.get('../game')
+
+
+class TestService(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.service = Service(Sessions(Game.get_all_games(), self.dir.name))
+        status, body = self.request('POST', '/sessions', {'title': GAME})
+        self.session = body['session']
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def request(self, method, target, data=None):
+        status, body = self.service.dispatch(
+            method, target, json.dumps(data).encode() if data else b'')
+        return status, body
+
+    def test_draw_and_epidemic(self):
+        status, stats = self.request('POST', f'/sessions/{self.session}/draw',
+                                     {'card': 'Lagos'})
+        self.assertEqual(status, 200)
+        self.assertEqual(stats['in_discard'], 1)
+        status, stats = self.request(
+            'POST', f'/sessions/{self.session}/epidemic', {'card': 'Londres'})
+        self.assertEqual(stats['epidemics'], 1)
+        self.assertEqual(stats['in_discard'], 0)
+
+    def test_probabilities(self):
+        target = f'/sessions/{self.session}/probabilities'
+        status, body = self.request('GET', f'{target}?position=1')
+        self.assertAlmostEqual(sum(c['probability'] for c in body['cards']), 1)
+        status, body = self.request('GET', f'{target}?draws=67&color=black')
+        self.assertAlmostEqual(body['chance'], 1)
+
+    def test_evicted_session_is_not_loaded_by_dispatch(self):
+        self.service.sessions.evict(self.session)
+        self.service.sessions.load = None   # Only prepare() may load it
+        status, body = self.request('GET', f'/sessions/{self.session}')
+        self.assertEqual(status, 404)
+
+    def test_errors(self):
+        status, body = self.request('POST', f'/sessions/{self.session}/draw',
+                                    {'card': 'Nowhere'})
+        self.assertEqual(status, 400)
+        status, body = self.request('GET', '/sessions/0123456789abcdef')
+        self.assertEqual(status, 404)
+        status, body = self.request('PUT', f'/sessions/{self.session}/undo')
+        self.assertEqual(status, 405)
+
+
+class TestServer(IsolatedAsyncioTestCase):
+    async def test_requests_over_a_connection(self):
+        with tempfile.TemporaryDirectory() as path:
+            service = Service(Sessions(Game.get_all_games(), path))
+            server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+            async def request(method, target, data):
+                body = json.dumps(data).encode()
+                writer.write(f'{method} {target} HTTP/1.1\r\n'
+                             f'Content-Length: {len(body)}\r\n\r\n'.encode()
+                             + body)
+                status = await reader.readline()
+                headers = {}
+                line = await reader.readline()
+                while line != b'\r\n':
+                    name, _, value = line.decode().partition(':')
+                    headers[name.lower()] = value.strip()
+                    line = await reader.readline()
+                length = int(headers['content-length'])
+                return status, json.loads(await reader.readexactly(length))
+
+            status, body = await request('POST', '/sessions', {'title': GAME})
+            self.assertIn(b'200 OK', status)
+            status, body = await request(
+                'POST', f'/sessions/{body["session"]}/draw', {'card': 'Lagos'})
+            self.assertEqual(body['in_discard'], 1)
+            writer.close()
+            server.close()
+            await server.wait_closed()
+
+    async def test_invalid_content_length(self):
+        with tempfile.TemporaryDirectory() as path:
+            service = Service(Sessions(Game.get_all_games(), path))
+            server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'POST /sessions HTTP/1.1\r\n'
+                         b'Content-Length: twelve\r\n\r\n')
+            response = await reader.read()
+            self.assertIn(b'400 Bad Request', response)
+            self.assertIn(b'Invalid Content-Length', response)
+            writer.close()
+            server.close()
+            await server.wait_closed()
+
+    async def test_sessions_are_saved_and_loaded_in_threads(self):
+        with tempfile.TemporaryDirectory() as path:
+            sessions = Sessions(Game.get_all_games(), path, capacity=1)
+            service = Service(sessions)
+            status, body = service.dispatch(
+                'POST', '/sessions', json.dumps({'title': GAME}).encode())
+            first = body['session']
+            await service.prepare('POST', '/sessions')
+            self.assertNotIn(first, sessions.live)
+            self.assertTrue(os.path.exists(sessions.file(first)))
+            second = sessions.create(GAME)
+            await service.prepare('GET', f'/sessions/{first}')
+            self.assertEqual(list(sessions.live), [first])
+            self.assertTrue(os.path.exists(sessions.file(second)))
+
+    async def test_concurrent_requests_find_their_session(self):
+        with tempfile.TemporaryDirectory() as path:
+            sessions = Sessions(Game.get_all_games(), path, capacity=1)
+            service = Service(sessions)
+            ids = [sessions.create(GAME) for i in range(3)]
+            sessions.get(ids[0]).infect('Lagos')
+
+            async def request(session):
+                await service.prepare('GET', f'/sessions/{session}')
+                return service.dispatch('GET', f'/sessions/{session}')
+
+            responses = await asyncio.gather(*[request(session)
+                                               for session in ids * 3])
+            self.assertEqual({status for status, body in responses}, {200})
+            self.assertEqual([body['in_discard'] for status, body
+                              in responses[::3]], [1, 1, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
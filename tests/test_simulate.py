@@ -0,0 +1,63 @@
+import unittest
+from unittest.case import TestCase
+from types import SimpleNamespace
+
+from decks import Card, Deck, DrawDeck
+from odds import Forecast
+from simulate import simulate
+
+
+class TestSimulate(TestCase):
+    def setUp(self):
+        self.cards = [Card(f'City {i}', 'blue') for i in range(8)]
+        starter = Deck('Starter Deck')
+        for card in self.cards[:6]:
+            starter.add(card)
+        epidemic = Deck('Epidemic #1')
+        for card in self.cards[6:]:
+            epidemic.add(card)
+        self.game = SimpleNamespace(deck={'draw': DrawDeck('draw'),
+                                          'discard': Deck('discard'),
+                                          'exclude': Deck('exclude')})
+        self.game.deck['draw'].add(starter)
+        self.game.deck['draw'].add(epidemic)
+
+    def test_known_draws(self):
+        result = simulate(self.game, turns=1, rate=2, rollouts=100,
+                          processes=1)
+        self.assertEqual(result.rollouts, 100)
+        self.assertEqual(result.chance(self.cards[6]), 1)
+        self.assertEqual(result.chance(self.cards[0]), 0)
+
+    def test_matches_exact_odds(self):
+        result = simulate(self.game, turns=2, rate=2, rollouts=20000,
+                          seed=1, processes=1)
+        forecast = Forecast(self.game.deck['draw'])
+        for card in self.cards:
+            self.assertAlmostEqual(result.chance(card),
+                                   forecast.city(card, 4), delta=.02)
+
+    def test_epidemic_splits_periods(self):
+        result = simulate(self.game, turns=3, rate=2, epidemics=[1],
+                          rollouts=1000, seed=1, processes=1)
+        self.assertEqual(result.periods, [(0, 1), (1, 3)])
+        # The epidemic reshuffles the two infected cards on top
+        self.assertEqual(result.chance(self.cards[6], period=1), 1)
+        self.assertAlmostEqual(result.mean(self.cards[7], period=1), 1)
+
+    def test_results_do_not_depend_on_processes(self):
+        args = dict(turns=3, rate=[1, 2, 2], epidemics=[2], rollouts=3000,
+                    seed=42, batch_size=1000)
+        single = simulate(self.game, processes=1, **args)
+        pooled = simulate(self.game, processes=2, **args)
+        self.assertTrue((single.histogram == pooled.histogram).all())
+
+    def test_invalid_schedule(self):
+        with self.assertRaises(ValueError):
+            simulate(self.game, turns=2, rate=[1], processes=1)
+        with self.assertRaises(ValueError):
+            simulate(self.game, turns=2, epidemics=[5], processes=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
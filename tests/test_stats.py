@@ -0,0 +1,55 @@
+import unittest
+from unittest.case import TestCase
+from collections import Counter
+import random
+
+from decks import Card, Deck, DrawDeck
+from stats import Stats
+
+
+class TestStats(TestCase):
+    def setUp(self):
+        self.cards = [Card(f'City {i}', 'blue') for i in range(6)]
+        starter = Deck('Starter Deck')
+        for i, card in enumerate(self.cards):
+            for j in range(i % 3 + 1):
+                starter.add(card)
+        self.deck = {'draw': DrawDeck('draw'),
+                     'discard': Deck('discard'),
+                     'exclude': Deck('exclude')}
+        self.deck['draw'].add(starter)
+        self.stats = Stats(self.deck)
+
+    def assert_matches_recount(self):
+        counts = Counter(self.deck['draw'].top().cards)
+        top_freq = max(counts.values())
+        self.assertEqual(self.stats.top_freq, top_freq)
+        self.assertCountEqual(
+            self.stats.top_cards,
+            [card for card, count in counts.items() if count == top_freq])
+        self.assertAlmostEqual(
+            self.stats.percentage, top_freq / sum(counts.values()))
+
+    def test_initial_stats(self):
+        self.assertEqual(self.stats.total, 12)
+        self.assertEqual(self.stats.top_freq, 3)
+        self.assert_matches_recount()
+
+    def test_stats_follow_random_moves(self):
+        rng = random.Random(0)
+        draw, discard = self.deck['draw'], self.deck['discard']
+        for i in range(200):
+            if not draw.is_empty() and \
+                    (discard.is_empty() or rng.random() < .6):
+                card = rng.choice(list(draw.top().unique()))
+                draw.move(card, discard)
+            elif not discard.is_empty():
+                card = rng.choice(list(discard.unique()))
+                position = rng.choice(['top', 'bottom', 'single'])
+                discard.move(card, draw, position=position)
+            if not draw.is_empty():
+                self.assert_matches_recount()
+
+
+if __name__ == '__main__':
+    unittest.main()
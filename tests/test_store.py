@@ -0,0 +1,112 @@
+import unittest
+from unittest.case import TestCase
+import os
+import tempfile
+
+from engine import Engine
+from game import Game, Move
+from store import Store
+
+GAME = 'Legacy Season 2 (Full)'
+
+
+class TestStore(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'games.sqlite')
+        self.engine = Engine()
+        self.store = Store(self.path)
+        self.store.attach(self.engine.game)
+        self.engine.new_game(GAME)
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    def play(self):
+        for name in ['Lagos', 'Paris', 'Jakarta']:
+            self.engine.infect(name)
+        self.engine.move('Paris', 'discard', 'exclude')
+        self.engine.epidemic('Londres')
+
+    def resumed(self):
+        game = Game()
+        store = Store(self.path)
+        store.attach(game)
+        store.resume()
+        return game, store
+
+    def test_database_uses_wal(self):
+        mode = self.store.connection.execute('PRAGMA journal_mode')
+        self.assertEqual(mode.fetchone()[0], 'wal')
+
+    def test_resume_last_game(self):
+        self.play()
+        game, store = self.resumed()
+        self.assertEqual(game.snapshot(), self.engine.game.snapshot())
+        self.assertEqual(game.epidemic_count, 1)
+
+        # The resumed game carries on in the same row
+        Engine(game).infect('Lagos')
+        self.assertEqual(len(store.games()), 1)
+        self.assertEqual(store.games()[0][4], 6)
+        store.close()
+
+    def test_resume_after_new_game(self):
+        self.play()
+        self.engine.new_game(GAME)
+        self.engine.infect('Lagos')
+        game, store = self.resumed()
+        self.assertEqual(game.snapshot(), self.engine.game.snapshot())
+        self.assertEqual(len(store.games()), 2)
+        store.close()
+
+    def test_event_queries(self):
+        self.play()
+        self.engine.new_game(GAME)
+        self.engine.epidemic('Londres')
+        epidemics = self.store.events(card='Londres', kind='epidemic')
+        self.assertEqual(len(epidemics), 2)
+        self.assertNotEqual(epidemics[0][0], epidemics[1][0])
+        self.assertEqual(epidemics[0][2].target, 'discard')
+        game = self.store.events(game_id=epidemics[0][0])
+        self.assertEqual([event.kind for g, t, event in game],
+                         ['draw', 'draw', 'draw', 'move', 'epidemic'])
+
+    def test_undo_is_saved(self):
+        self.play()
+        self.engine.undo()
+        game, store = self.resumed()
+        self.assertEqual(game.epidemic_count, 0)
+        store.close()
+
+    def event_count(self):
+        game_id, title, started, updated, events = self.store.games()[0]
+        return events
+
+    def test_batch_is_saved(self):
+        self.play()
+        game = self.engine.game
+        lagos = self.engine.card('Lagos')
+        moves = [Move(lagos, 'draw', 'discard'),
+                 Move(lagos, 'discard', 'exclude', 'deck')]
+        before = self.event_count()
+        game.apply(moves)
+        self.assertEqual(self.event_count(), before + len(moves))
+        events = self.store.events(game_id=self.store.last_game()[0])
+        self.assertEqual([event.kind for g, t, event in events[-2:]],
+                         ['draw', 'move'])
+        resumed, store = self.resumed()
+        self.assertEqual(resumed.snapshot(), game.snapshot())
+        store.close()
+
+    def test_delete_game(self):
+        self.play()
+        game_id = self.store.last_game()[0]
+        self.store.delete(game_id)
+        self.assertIsNone(self.store.last_game())
+        self.assertEqual(self.store.events(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
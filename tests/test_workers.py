@@ -0,0 +1,111 @@
+import unittest
+from unittest.case import TestCase
+
+from PySide2.QtWidgets import QApplication
+
+from decks import Card, Deck
+from game import Game
+from odds import Forecast
+from workers import Workers, Cancelled, color_chances, pool_chances, thaw
+
+
+def new_game():
+    starter = Deck('Starter Deck')
+    for name, color in [('Card A', 'black'), ('Card B', 'blue'),
+                        ('Card C', 'red'), ('Card D', 'blue')]:
+        for i in range(2):
+            starter.add(Card(name, color))
+    game = Game({'Test': starter})
+    game.initialise('Test')
+    return game
+
+
+class TestJobs(TestCase):
+    def setUp(self):
+        self.game = new_game()
+        draw = self.game.deck['draw']
+        self.game.draw_card(draw, self.game.deck['discard'],
+                            draw.top().find('Card A'))
+        self.game.epidemic('Card B')
+        self.state = self.game.snapshot()
+
+    def test_thaw_is_a_private_copy(self):
+        deck = thaw(self.state)
+        self.assertIsNot(deck, self.game.deck['draw'])
+        self.assertEqual(deck.fingerprint, self.game.deck['draw'].fingerprint)
+        deck.remove(deck.top().find('Card A'))
+        self.assertEqual(len(self.game.deck['draw']), len(deck) + 1)
+
+    def test_color_chances(self):
+        chances = color_chances(self.state, 3)
+        forecast = Forecast(self.game.deck['draw'])
+        self.assertEqual(set(chances), {'black', 'blue', 'red'})
+        for color, chance in chances.items():
+            self.assertAlmostEqual(chance, forecast.color(color, 3))
+
+    def test_pool_chances(self):
+        draw = self.game.deck['draw']
+        top = draw.pool_at(0)
+        chances = pool_chances(self.state, 0)
+        self.assertEqual(list(chances), [card.name for card in top.sorted()])
+        for card in top.unique():
+            self.assertAlmostEqual(chances[card.name],
+                                   top.count(card) / len(top))
+
+    def test_cancelled_job_stops(self):
+        with self.assertRaises(Cancelled):
+            color_chances(self.state, 3, cancelled=lambda: True)
+
+
+class TestWorkers(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.application = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.game = new_game()
+        self.workers = Workers()
+        self.results = []
+        self.workers.color_chances.connect(self.results.append)
+
+    def run_jobs(self):
+        self.workers.wait()
+        self.application.processEvents()
+
+    def test_result_is_delivered(self):
+        self.workers.submit('color_chances', color_chances,
+                            self.game.snapshot(), 3)
+        self.run_jobs()
+        self.assertEqual(len(self.results), 1)
+        self.assertEqual(set(self.results[0]), {'black', 'blue', 'red'})
+
+    def test_only_the_latest_job_is_delivered(self):
+        self.workers.submit('color_chances', color_chances,
+                            self.game.snapshot(), 1)
+        self.workers.submit('color_chances', color_chances,
+                            self.game.snapshot(), 3)
+        self.run_jobs()
+        self.assertEqual(self.results, [color_chances(self.game.snapshot(),
+                                                      3)])
+
+    def test_move_cancels_jobs(self):
+        self.game.subscribe(self.workers.cancel)
+        self.workers.submit('color_chances', color_chances,
+                            self.game.snapshot(), 3)
+        draw = self.game.deck['draw']
+        self.game.draw_card(draw, self.game.deck['discard'],
+                            draw.top().find('Card A'))
+        self.run_jobs()
+        self.assertEqual(self.results, [])
+
+    def test_shutdown_waits_for_running_jobs(self):
+        self.workers.submit('color_chances', color_chances,
+                            self.game.snapshot(), 3)
+        self.workers.shutdown()
+        self.assertEqual(self.workers.pool.activeThreadCount(), 0)
+        self.application.processEvents()
+        self.assertEqual(self.results, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
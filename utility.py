@@ -16,4 +16,30 @@ def get_path(filename):
         file = NSBundle.mainBundle().pathForResource_ofType_(name, ext)
         return file or os.path.realpath(filename)
     else:
-        return os.path.realpath(filename)
\ No newline at end of file
+        return os.path.realpath(filename)
+
+
+def get_cache_dir():
+    """Return the per-user cache directory of the application,
+    creating it if needed."""
+    if platform.system() == "Darwin":
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or \
+            os.path.expanduser('~/.cache')
+    path = os.path.join(base, 'epidemic')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_data_dir():
+    """Return the per-user data directory of the application,
+    creating it if needed."""
+    if platform.system() == "Darwin":
+        base = os.path.expanduser('~/Library/Application Support')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or \
+            os.path.expanduser('~/.local/share')
+    path = os.path.join(base, 'epidemic')
+    os.makedirs(path, exist_ok=True)
+    return path
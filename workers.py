@@ -0,0 +1,140 @@
+"""
+Background jobs computing probabilities for the panels of the App.
+
+Jobs run on a QThreadPool and never touch the decks of the Game:
+each one gets the immutable GameState of game.snapshot() and rebuilds
+a private DrawDeck from it. Every job of a kind replaces the previous
+one, and every move of the Game cancels them all, so a job that is
+overtaken is skipped if it hasn't started, stops between cards if it
+has, and its result is dropped if it still finishes.
+
+    workers = Workers()
+    workers.color_chances.connect(view.stats.show_chances)
+    workers.submit('color_chances', color_chances, game.snapshot(), 3)
+
+Results are emitted by Workers signals in the GUI thread, named after
+the kind of job.
+"""
+
+from PySide2.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from decks import Card, DrawDeck
+from odds import Forecast
+
+import logging
+
+FORECAST_DRAWS = 3          # Draws covered by the color chances
+
+
+class Cancelled(Exception):
+    """Raised by a job that was overtaken."""
+
+
+def thaw(state):
+    """Return a private DrawDeck with the Draw Deck of a GameState."""
+    deck = DrawDeck('draw')
+    deck.load(state.draw)
+    return deck
+
+
+def color_chances(state, draws, cancelled=lambda: False):
+    """Return {color: chance} of drawing each color of the Draw Deck
+    within the next draws."""
+    deck = thaw(state)
+    forecast = Forecast(deck)
+    colors = {card.color for pool, count in deck.segments
+              for card in pool.unique()}
+    chances = {}
+    for color in Card.valid_colors:
+        if color in colors:
+            if cancelled():
+                raise Cancelled
+            chances[color] = forecast.color(color, draws)
+    return chances
+
+
+def pool_chances(state, position, cancelled=lambda: False):
+    """Return {card name: chance} of each card of the pool at a draw
+    position (counted from 0) being drawn by that position."""
+    deck = thaw(state)
+    forecast = Forecast(deck)
+    chances = {}
+    for card in deck.pool_at(position).sorted():
+        if cancelled():
+            raise Cancelled
+        chances[card.name] = forecast.city(card, position + 1)
+    return chances
+
+
+class Job(QRunnable):
+    def __init__(self, workers, kind, ticket, function, args):
+        super().__init__()
+        self.workers = workers
+        self.kind = kind
+        self.ticket = ticket
+        self.function = function
+        self.args = args
+
+    def cancelled(self):
+        return self.workers.latest.get(self.kind) != self.ticket
+
+    def run(self):
+        try:
+            if self.cancelled():
+                raise Cancelled
+            result = self.function(*self.args, cancelled=self.cancelled)
+        except Cancelled:
+            logging.debug(f'[Workers] {self.kind} job {self.ticket} cancelled')
+            return
+        except Exception:
+            logging.exception(f'[Workers] {self.kind} job failed')
+            return
+        self.workers.finished.emit(self.kind, self.ticket, result)
+
+
+class Workers(QObject):
+    """Runs jobs on a thread pool and emits the results of the ones
+    that were not overtaken."""
+
+    # (kind, ticket, result), emitted from the pool threads
+    finished = Signal(str, int, object)
+
+    # Results, by kind of job
+    color_chances = Signal(object)
+    pool_chances = Signal(object)
+
+    def __init__(self, pool=None):
+        super().__init__()
+        self.pool = pool if pool is not None else QThreadPool.globalInstance()
+        self.ticket = 0
+        self.latest = {}    # Kind -> ticket of the job to deliver
+        self.finished.connect(self.deliver)
+
+    def submit(self, kind, function, *args):
+        """Run function(*args, cancelled=callable) in the background,
+        replacing the previous job of the same kind."""
+        self.ticket += 1
+        self.latest[kind] = self.ticket
+        self.pool.start(Job(self, kind, self.ticket, function, args))
+        return self.ticket
+
+    def cancel(self, event=None):
+        """Cancel every job, for instance when the game changes."""
+        self.latest = {}
+        self.pool.clear()
+
+    def deliver(self, kind, ticket, result):
+        # Runs in the thread of the Workers, after any later submit
+        if self.latest.get(kind) == ticket:
+            del self.latest[kind]
+            getattr(self, kind).emit(result)
+
+    def wait(self, msecs=-1):
+        """Wait for the running jobs to finish."""
+        return self.pool.waitForDone(msecs)
+
+    def shutdown(self):
+        """Cancel every job and wait for the running ones to stop,
+        so that none outlives the application."""
+        self.cancel()
+        self.wait()